@@ -0,0 +1,182 @@
+import mmap
+import os
+import struct
+import sys
+
+import distindex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "data")
+DEFAULT_SOURCE = os.path.join(DATA_DIR, "aliases.txt")
+DEFAULT_DATABASE = os.path.join(DATA_DIR, "aliases.db")
+
+# File layout, all integers little-endian uint32:
+#   magic (8 bytes) | count | offsets[count + 1] | records
+# Records are "import\tdistribution" in UTF-8, sorted by import name, and
+# record i spans offsets[i]..offsets[i + 1] relative to the records start.
+MAGIC = b"EBALIAS1"
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+
+
+def parse_alias_lines(lines):
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if "=" in line:
+            module, dist = line.split("=", 1)
+        else:
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            module, dist = parts
+        module, dist = module.strip(), dist.strip()
+        if module and dist:
+            yield module, dist
+
+
+def read_alias_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return dict(parse_alias_lines(f))
+
+
+def write_database(mapping, path):
+    records = [f"{module}\t{dist}".encode("utf-8")
+               for module, dist in sorted(mapping.items(), key=lambda item: item[0].encode("utf-8"))]
+    offsets = [0]
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(records)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for record in records:
+            f.write(record)
+    os.replace(tmp_path, path)
+
+
+class AliasDatabase:
+    def __init__(self, path=DEFAULT_DATABASE, overlays=()):
+        self.path = path
+        self.overlay = {}
+        for overlay in overlays:
+            self.overlay.update(read_alias_file(overlay))
+
+        self._file = None
+        self._map = None
+        self.count = 0
+        if path and os.path.exists(path) and os.path.getsize(path) > _HEADER.size:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                self.close()
+                raise ValueError(f"{path} is not an EnvBuilder alias database")
+            self._records = _HEADER.size + _OFFSET.size * (self.count + 1)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        self._map = self._file = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count + len(self.overlay)
+
+    def _record(self, i):
+        start = _OFFSET.unpack_from(self._map, _HEADER.size + _OFFSET.size * i)[0]
+        end = _OFFSET.unpack_from(self._map, _HEADER.size + _OFFSET.size * (i + 1))[0]
+        return self._records + start, self._records + end
+
+    def lookup(self, module):
+        if module in self.overlay:
+            return self.overlay[module]
+        if self._map is None:
+            return None
+
+        key = module.encode("utf-8") + b"\t"
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = self._record(mid)
+            probe = self._map[start:min(end, start + len(key))]
+            if probe == key:
+                return self._map[start + len(key):end].decode("utf-8")
+            # Comparing the tab-terminated prefix orders "a\t..." before
+            # "ab\t..." exactly as the byte-sorted import names are.
+            if probe < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def items(self):
+        for i in range(self.count):
+            start, end = self._record(i)
+            module, dist = self._map[start:end].decode("utf-8").split("\t", 1)
+            if module not in self.overlay:
+                yield module, dist
+        yield from self.overlay.items()
+
+
+def overlay_dirs():
+    if os.name == 'nt':
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return [os.path.join(base, "envbuilder", "aliases.d")]
+
+
+def overlay_files():
+    files = []
+    for directory in overlay_dirs():
+        if os.path.isdir(directory):
+            files.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                         if name.endswith(".txt"))
+    files.extend(path for path in os.environ.get("ENVBUILDER_ALIASES", "").split(os.pathsep) if path)
+    return files
+
+
+_default = None
+
+
+def default_database():
+    global _default
+    if _default is None:
+        _default = AliasDatabase(DEFAULT_DATABASE, overlay_files())
+    return _default
+
+
+def installed_aliases():
+    mapping = {}
+    for name, version, modules, requires in distindex.collect_distributions():
+        for module in modules:
+            if distindex.normalize_name(module) != distindex.normalize_name(name):
+                mapping.setdefault(module, name)
+    return mapping
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the EnvBuilder import-to-package alias database.")
+    parser.add_argument("sources", nargs="*", default=[DEFAULT_SOURCE],
+                        help="alias text files with one 'import_name distribution' pair per line")
+    parser.add_argument("-o", "--output", default=DEFAULT_DATABASE)
+    parser.add_argument("--from-installed", action="store_true",
+                        help="also add every import name whose distribution is installed here")
+    args = parser.parse_args(argv)
+
+    mapping = installed_aliases() if args.from_installed else {}
+    for source in args.sources:
+        mapping.update(read_alias_file(source))
+    write_database(mapping, args.output)
+    print(f"Wrote {len(mapping)} aliases to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import io
+import os
+import posixpath
+import tarfile
+import zipfile
+import zlib
+
+import notebooks
+import scanner
+
+_TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+# What a truncated or corrupt archive raises part way through reading it.
+ARCHIVE_ERRORS = (tarfile.TarError, zipfile.BadZipFile, zlib.error, OSError, EOFError)
+
+
+def iter_source_members(path):
+    # Yields (name, binary file object) for every .py and .ipynb member, in
+    # archive order, without extracting anything to disk.
+    if path.lower().endswith(_TAR_EXTENSIONS):
+        # Stream mode reads a compressed tar front to back exactly once.
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith(scanner.SOURCE_EXTENSIONS):
+                    f = archive.extractfile(member)
+                    if member.name.endswith(".ipynb"):
+                        # Stream members cannot seek back for the nbformat
+                        # fallback, so notebooks are buffered.
+                        f = io.BytesIO(f.read())
+                    yield member.name, f
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.endswith(scanner.SOURCE_EXTENSIONS):
+                with archive.open(info) as f:
+                    yield info.filename, f
+
+
+def _member_nodes(name, f, fast):
+    if name.endswith(".ipynb"):
+        nodes = []
+        for source in notebooks.read_code_cells(f):
+            try:
+                nodes.extend(scanner.import_nodes(source, fast, validate=False))
+            except SyntaxError:
+                continue
+        return nodes
+    return scanner.import_nodes(f.read().decode("utf-8"), fast)
+
+
+def scan_archive(path, fast=True):
+    # Members are parsed as they stream past. Whether an import is local
+    # depends on files that may come later in the archive, so imports are
+    # classified once the whole file list has been seen.
+    parsed = []
+    names = set()
+    broken = None
+    try:
+        for name, f in iter_source_members(path):
+            name = posixpath.normpath(name.lstrip("/"))
+            names.add(name)
+            try:
+                parsed.append((name, _member_nodes(name, f, fast), None))
+            except Exception as e:
+                parsed.append((name, None, f"{type(e).__name__}: {e}"))
+    except ARCHIVE_ERRORS as e:
+        # Members read before the damage are still reported.
+        broken = f"{type(e).__name__}: {e}"
+
+    def isfile(member):
+        return posixpath.normpath(member.replace(os.sep, "/")) in names
+
+    for name, nodes, error in parsed:
+        member_path = os.path.join(path, *name.split("/"))
+        if error:
+            yield scanner.ScanResult(member_path, frozenset(), error, None)
+        else:
+            imports = scanner.imports_from_nodes(nodes, posixpath.dirname(name), isfile)
+            yield scanner.ScanResult(member_path, frozenset(imports), None, None)
+    if broken:
+        yield scanner.ScanResult(path, frozenset(), broken, None)
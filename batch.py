@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+import builder
+import modgraph
+import render
+import resolver
+import scanner
+
+JobResult = namedtuple("JobResult", ["project", "venv_dir", "created", "seconds", "error"])
+
+
+def default_workers(jobs):
+    # Each job is mostly one pip process; one per core keeps the machine
+    # busy without the jobs fighting over it.
+    return max(1, min(jobs, scanner.available_cores()))
+
+
+def project_requirements(project, deps, lock=False):
+    # requirements.txt content for one project. Scans run in the calling
+    # thread: the batch pool already provides the parallelism.
+    if os.path.isfile(project) and not scanner.is_archive(project):
+        modules, errors = modgraph.scan_entry(project)
+    else:
+        modules = set()
+        import_cache = scanner.open_cache()
+        try:
+            for result in scanner.scan_path(project, workers=1, import_cache=import_cache):
+                modules.update(result.imports)
+        finally:
+            if import_cache:
+                import_cache.close()
+
+    return render.requirements_content(deps, sorted(modules), lock=lock)[0]
+
+
+def venv_dir_for(project, venv_name):
+    base = project if os.path.isdir(project) else os.path.dirname(project)
+    return os.path.join(os.path.abspath(base), venv_name)
+
+
+def build_all(projects, venv_name="venv", workers=None, interpreter=None, lock=False, templates=None,
+              use_wheelhouse=False, use_shared_store=False, pip_cache=None, log=None, progress=None,
+              cancel=None):
+    # Builds venv_name inside every project, at most workers at a time.
+    # log(index, text) and progress(index, percent) report per job, from
+    # worker threads. Returns one JobResult per project, in order.
+    from concurrent.futures import ThreadPoolExecutor
+
+    projects = list(projects)
+    log = log or (lambda index, text: None)
+    progress = progress or (lambda index, value: None)
+    # pip's cache is safe to share between processes; pointing every job at
+    # the same one means a wheel downloaded by one job is reused by the rest.
+    pip_env = {"PIP_CACHE_DIR": pip_cache} if pip_cache else None
+    deps = resolver.Resolver(dict(resolver.COMMON_ALIASES), interpreter)
+
+    def run(index):
+        project = projects[index]
+        venv_dir = venv_dir_for(project, venv_name)
+        if cancel is not None and cancel.is_set():
+            return JobResult(project, venv_dir, False, 0.0, "cancelled")
+        if os.path.exists(venv_dir):
+            # Never build into, or on cancel delete, an environment the
+            # project already has.
+            return JobResult(project, venv_dir, False, 0.0, "already exists")
+        start = time.perf_counter()
+        requirements_file = None
+        try:
+            log(index, f"Scanning {project}...\n")
+            content = project_requirements(project, deps, lock)
+            fd, requirements_file = tempfile.mkstemp(prefix="envbuilder-", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            progress(index, 10)
+            created = builder.build_environment(
+                venv_dir, requirements_file,
+                interpreter=interpreter,
+                templates=templates,
+                use_wheelhouse=use_wheelhouse,
+                use_shared_store=use_shared_store,
+                log=lambda text: log(index, text),
+                progress=lambda value: progress(index, value),
+                cancel=cancel,
+                pip_env=pip_env,
+            )
+            error = None if created else "cancelled" if cancel is not None and cancel.is_set() else "failed"
+            return JobResult(project, venv_dir, created, time.perf_counter() - start, error)
+        except Exception as e:
+            return JobResult(project, venv_dir, False, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+        finally:
+            if requirements_file and os.path.exists(requirements_file):
+                os.remove(requirements_file)
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers(len(projects))) as pool:
+        return list(pool.map(run, range(len(projects))))
@@ -0,0 +1,430 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import cache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(cache.cache_dir("bench"), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+
+THIRD_PARTY = [
+    "numpy", "pandas", "requests", "yaml", "cv2", "PIL", "sklearn", "scipy", "matplotlib", "bs4",
+    "flask", "django", "sqlalchemy", "torch", "tensorflow", "boto3", "attr", "click", "jinja2", "lxml",
+]
+STANDARD = ["os", "sys", "json", "re", "collections", "itertools", "functools", "typing", "pathlib", "logging"]
+WHEEL_COUNT = 20
+
+
+# -- corpus -----------------------------------------------------------------
+
+def _module_source(rng, package, siblings):
+    lines = ['"""Synthetic module generated by bench.py."""']
+    for name in rng.sample(STANDARD, 3):
+        lines.append(f"import {name}")
+    for name in rng.sample(THIRD_PARTY, 4):
+        lines.append(f"from {name} import something" if rng.random() < 0.5 else f"import {name}")
+    if siblings:
+        lines.append(f"from .{rng.choice(siblings)} import helper")
+    for i in range(rng.randint(5, 25)):
+        lines.append("")
+        lines.append(f"def function_{i}(value, *args, **kwargs):")
+        lines.append(f'    """Return value after step {i}; mentions import {rng.choice(THIRD_PARTY)} in text."""')
+        lines.append(f"    text = 'import {rng.choice(THIRD_PARTY)} inside a string'")
+        lines.append(f"    return (value, text, {i} * len(args))")
+    return "\n".join(lines) + "\n"
+
+
+def _make_project(root, files, rng):
+    packages = max(1, files // 25)
+    written = 0
+    for p in range(packages):
+        package = f"pkg{p:04d}"
+        directory = os.path.join(root, package)
+        os.makedirs(directory, exist_ok=True)
+        names = [f"mod{m:03d}" for m in range(min(25, files - written))]
+        with open(os.path.join(directory, "__init__.py"), "w", encoding="utf-8") as f:
+            f.write(f"from .{names[0]} import function_0\n" if names else "")
+        for i, name in enumerate(names):
+            with open(os.path.join(directory, name + ".py"), "w", encoding="utf-8") as f:
+                f.write(_module_source(rng, package, names[:i]))
+        written += len(names)
+        if written >= files:
+            break
+    with open(os.path.join(root, "main.py"), "w", encoding="utf-8") as f:
+        f.write("".join(f"import pkg{p:04d}\n" for p in range(packages)))
+    return written + packages + 1
+
+
+def _make_huge_module(path, target_bytes, rng):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("import os\nimport sys\n")
+        size = 0
+        block = 0
+        while size < target_bytes:
+            chunk = _module_source(rng, "huge", []).replace("def function_", f"def block{block}_function_")
+            f.write(chunk)
+            size += len(chunk)
+            block += 1
+
+
+def _make_notebook(path, cells, output_bytes, rng):
+    payload = base64.b64encode(rng.randbytes(output_bytes)).decode("ascii")
+    notebook = {"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}
+    for i in range(cells):
+        source = [f"import {rng.choice(THIRD_PARTY)}\n", f"result_{i} = {i} * 2\n"]
+        outputs = [{"output_type": "display_data", "metadata": {},
+                    "data": {"image/png": payload, "text/plain": [f"<Figure {i}>"]}}]
+        notebook["cells"].append({"cell_type": "code", "execution_count": i, "id": f"cell{i}",
+                                  "metadata": {}, "outputs": outputs, "source": source})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(notebook, f)
+
+
+def _write_wheel(directory, name, version):
+    dist_info = f"{name}-{version}.dist-info"
+    files = {
+        f"{name}/__init__.py": f"VERSION = {version!r}\n",
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\nGenerator: envbuilder-bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n",
+        f"{dist_info}/top_level.txt": f"{name}\n",
+    }
+    record = []
+    for path, text in files.items():
+        data = text.encode("utf-8")
+        digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=").decode("ascii")
+        record.append(f"{path},sha256={digest},{len(data)}")
+    record.append(f"{dist_info}/RECORD,,")
+    files[f"{dist_info}/RECORD"] = "\n".join(record) + "\n"
+    with zipfile.ZipFile(os.path.join(directory, f"{name}-{version}-py3-none-any.whl"), "w") as wheel:
+        for path, text in files.items():
+            wheel.writestr(path, text)
+
+
+def make_corpus(root, scale=1.0, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    manifest = {"scale": scale, "seed": seed}
+    manifest["project_files"] = _make_project(os.path.join(root, "project"), max(10, int(3000 * scale)), rng)
+
+    _make_huge_module(os.path.join(root, "huge.py"), int(20 * 1024 * 1024 * scale), rng)
+    _make_notebook(os.path.join(root, "outputs.ipynb"), max(1, int(150 * scale)), 256 * 1024, rng)
+
+    wheels = os.path.join(root, "wheels")
+    os.makedirs(wheels, exist_ok=True)
+    for i in range(WHEEL_COUNT):
+        _write_wheel(wheels, f"benchpkg{i}", "1.0")
+    with open(os.path.join(root, "requirements.txt"), "w", encoding="utf-8") as f:
+        f.write("".join(f"benchpkg{i}==1.0\n" for i in range(WHEEL_COUNT)))
+
+    with open(os.path.join(root, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+# -- benchmarks -------------------------------------------------------------
+# Each returns (seconds, units, unit) and runs in its own process, so the
+# peak RSS reported for it is its own.
+
+def _megabytes(path):
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def _project_modules(corpus):
+    import scanner
+    return scanner.merge_results(scanner.scan_path(os.path.join(corpus, "project"), workers=1))
+
+
+def bench_scan_cold(corpus):
+    import scanner
+    project = os.path.join(corpus, "project")
+    start = time.perf_counter()
+    count = sum(1 for result in scanner.scan_path(project))
+    return time.perf_counter() - start, count, "files"
+
+
+def bench_scan_warm(corpus):
+    import scanner
+    project = os.path.join(corpus, "project")
+    with cache.ImportCache(os.path.join(corpus, "bench-cache.sqlite"), scanner.SCAN_VERSION) as import_cache:
+        for result in scanner.scan_path(project, import_cache=import_cache):
+            pass
+        start = time.perf_counter()
+        count = sum(1 for result in scanner.scan_path(project, import_cache=import_cache))
+        return time.perf_counter() - start, count, "files"
+
+
+def bench_scan_huge_module(corpus):
+    import scanner
+    path = os.path.join(corpus, "huge.py")
+    start = time.perf_counter()
+    scanner.scan_file(path)
+    return time.perf_counter() - start, _megabytes(path), "MB"
+
+
+def bench_scan_notebook(corpus):
+    import scanner
+    path = os.path.join(corpus, "outputs.ipynb")
+    start = time.perf_counter()
+    scanner.scan_file(path)
+    return time.perf_counter() - start, _megabytes(path), "MB"
+
+
+def bench_entry_graph(corpus):
+    import modgraph
+    start = time.perf_counter()
+    graph = modgraph.ModuleGraph(modgraph.project_roots(os.path.join(corpus, "project", "main.py")))
+    graph.dependencies(os.path.join(corpus, "project", "main.py"))
+    return time.perf_counter() - start, len(graph.edges), "modules"
+
+
+def bench_get_versions(corpus):
+    import distindex
+    import probe
+    import resolver
+
+    modules = _project_modules(corpus)
+    start = time.perf_counter()
+    # A fresh index, as on the first resolve after start-up.
+    index = distindex.DistributionIndex(distindex.collect_distributions())
+    target = probe.InterpreterInfo(dict(probe.current_interpreter().data), index)
+    resolver.Resolver(dict(resolver.COMMON_ALIASES)).versions(modules, target)
+    return time.perf_counter() - start, len(modules), "modules"
+
+
+def bench_render(corpus):
+    import render
+    import resolver
+
+    modules = _project_modules(corpus)
+    deps = resolver.Resolver(dict(resolver.COMMON_ALIASES))
+    target = deps.target()
+    versions = deps.versions(modules, target)
+    rounds = 200
+    start = time.perf_counter()
+    for i in range(rounds):
+        output_type = "pip" if i % 2 else "conda"
+        render.display_lines(versions, output_type)
+        render.environment_file(versions, lambda mod: deps.package_name(mod, target), output_type)
+    return time.perf_counter() - start, rounds, "files"
+
+
+def bench_lock(corpus):
+    import lockfile
+    import probe
+
+    target = probe.current_interpreter()
+    names = [name for name, version in target.index.distributions.values()]
+    start = time.perf_counter()
+    lock = lockfile.lock(target, names)
+    return time.perf_counter() - start, len(lock.pins), "dists"
+
+
+def _build_venv(corpus, templates):
+    import builder
+    venv_dir = os.path.join(corpus, f"venv-{os.getpid()}-{time.time_ns()}")
+    try:
+        start = time.perf_counter()
+        created = builder.build_environment(venv_dir, os.path.join(corpus, "requirements.txt"),
+                                            templates=templates, use_wheelhouse=True,
+                                            wheelhouse_root=os.path.join(corpus, "wheels"))
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(venv_dir, ignore_errors=True)
+    if not created:
+        raise RuntimeError("venv creation from the local wheel directory failed")
+    return seconds
+
+
+def bench_venv_wheelhouse(corpus):
+    return _build_venv(corpus, None), WHEEL_COUNT, "packages"
+
+
+def bench_venv_template(corpus):
+    import venvs
+    templates = venvs.TemplateStore(os.path.join(corpus, f"templates-{os.getpid()}"))
+    try:
+        _build_venv(corpus, templates)
+        return _build_venv(corpus, templates), WHEEL_COUNT, "packages"
+    finally:
+        shutil.rmtree(templates.root, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "scan-cold": bench_scan_cold,
+    "scan-warm": bench_scan_warm,
+    "scan-huge-module": bench_scan_huge_module,
+    "scan-notebook": bench_scan_notebook,
+    "entry-graph": bench_entry_graph,
+    "get-versions": bench_get_versions,
+    "render": bench_render,
+    "lock": bench_lock,
+    "venv-wheelhouse": bench_venv_wheelhouse,
+    "venv-template": bench_venv_template,
+}
+VENV_BENCHMARKS = ("venv-wheelhouse", "venv-template")
+
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1024 if sys.platform == "darwin" else 1
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    return own, children
+
+
+def run_child(name, corpus):
+    seconds, units, unit = BENCHMARKS[name](corpus)
+    own, children = _peak_rss_kb()
+    json.dump({"seconds": seconds, "units": units, "unit": unit,
+               "peak_rss_kb": own, "children_peak_rss_kb": children}, sys.stdout)
+    return 0
+
+
+def run_benchmark(name, corpus, repeat):
+    # Best-of-N time, worst-of-N memory. Caches go to a private directory
+    # so the user's scan and probe caches neither help nor get polluted.
+    best = None
+    for i in range(repeat):
+        env = dict(os.environ, XDG_CACHE_HOME=os.path.join(corpus, "xdg-cache"),
+                   LOCALAPPDATA=os.path.join(corpus, "xdg-cache"))
+        shutil.rmtree(env["XDG_CACHE_HOME"], ignore_errors=True)
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, corpus],
+                                capture_output=True, text=True, env=env, cwd=HERE)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} failed:\n{result.stderr.strip()}")
+        sample = json.loads(result.stdout)
+        if best is None:
+            best = sample
+        else:
+            for key in ("peak_rss_kb", "children_peak_rss_kb"):
+                if sample[key] is not None:
+                    best[key] = max(best[key], sample[key])
+            best["seconds"] = min(best["seconds"], sample["seconds"])
+    best["throughput"] = best["units"] / best["seconds"] if best["seconds"] else None
+    return best
+
+
+# -- reporting --------------------------------------------------------------
+
+def compare(results, baseline, tolerance):
+    # A benchmark regresses when it is slower, or its own peak RSS larger,
+    # than the baseline by more than the tolerance.
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        if result["seconds"] > before["seconds"] * (1 + tolerance):
+            regressions.append((name, "time", before["seconds"], result["seconds"]))
+        if result["peak_rss_kb"] and before.get("peak_rss_kb") and \
+                result["peak_rss_kb"] > before["peak_rss_kb"] * (1 + tolerance):
+            regressions.append((name, "peak RSS", before["peak_rss_kb"], result["peak_rss_kb"]))
+    return regressions
+
+
+def _format_rss(kb):
+    return f"{kb / 1024:.0f} MB" if kb else "n/a"
+
+
+def report(results, baseline):
+    print(f"{'benchmark':<18} {'time':>10} {'throughput':>20} {'peak RSS':>10} {'children':>10} {'vs base':>8}")
+    for name, result in results.items():
+        throughput = f"{result['throughput']:,.1f} {result['unit']}/s" if result["throughput"] else "n/a"
+        before = baseline.get("results", {}).get(name) if baseline else None
+        change = f"{result['seconds'] / before['seconds']:.2f}x" if before and before["seconds"] else "-"
+        print(f"{name:<18} {result['seconds']:>9.3f}s {throughput:>20} {_format_rss(result['peak_rss_kb']):>10} "
+              f"{_format_rss(result['children_peak_rss_kb']):>10} {change:>8}")
+
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark EnvBuilder's scan, resolve, render and venv phases offline.")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier (1.0: 3000 files, 20 MB module)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the fastest is reported")
+    parser.add_argument("--only", help="comma-separated benchmarks to run: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--skip-venv", action="store_true", help="skip the venv creation benchmarks")
+    parser.add_argument("--corpus", help="reuse or create the corpus in this directory instead of a temporary one")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a result counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--child", nargs=2, metavar=("NAME", "CORPUS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(*args.child)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    if args.skip_venv:
+        names = [name for name in names if name not in VENV_BENCHMARKS]
+
+    corpus = args.corpus or tempfile.mkdtemp(prefix="envbuilder-bench-")
+    try:
+        manifest = load_baseline(os.path.join(corpus, "corpus.json"))
+        if not manifest or manifest.get("scale") != args.scale:
+            print(f"Generating corpus in {corpus} (scale {args.scale})...", file=sys.stderr)
+            start = time.perf_counter()
+            make_corpus(corpus, args.scale)
+            print(f"Corpus ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        results = {}
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_benchmark(name, corpus, max(1, args.repeat))
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus, ignore_errors=True)
+
+    document = {"python": sys.version.split()[0], "platform": sys.platform, "scale": args.scale,
+                "created": time.time(), "results": results}
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("scale") != args.scale:
+        print(f"Baseline was recorded at scale {baseline.get('scale')}; not comparing.", file=sys.stderr)
+        baseline = None
+    report(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        if baseline:
+            # Keep entries for benchmarks that were not run this time.
+            document["results"] = dict(baseline["results"], **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else []
+    for name, metric, before, after in regressions:
+        print(f"REGRESSION {name}: {metric} {before:.3f} -> {after:.3f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
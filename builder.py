@@ -0,0 +1,110 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import instrument
+import pipstream
+import pkgstore
+import probe
+import venvs
+import wheelhouse
+
+
+def _ignore(value):
+    pass
+
+
+def _cancelled(venv_dir, created, log):
+    # Only a directory this run created is removed; cancelling a build
+    # aimed at an existing environment must not delete it.
+    if created:
+        shutil.rmtree(venv_dir, ignore_errors=True)
+    log("Installation cancelled.\n")
+    return False
+
+
+def _timing_summary(install_progress):
+    slowest = ", ".join(f"{package.name} {package.seconds:.1f}s" for package in install_progress.slowest())
+    summary = f"pip finished in {install_progress.elapsed():.1f}s"
+    if install_progress.install_seconds >= 0.05:
+        summary += f" ({install_progress.install_seconds:.1f}s installing)"
+    if slowest:
+        summary += f"; slowest packages: {slowest}"
+    return summary + "\n"
+
+
+def build_environment(venv_dir, requirements_file, interpreter=None, templates=None,
+                      use_wheelhouse=False, use_shared_store=False, log=None, progress=None, cancel=None,
+                      wheelhouse_root=None, pip_env=None):
+    log = log or _ignore
+    progress = progress or _ignore
+    interpreter = interpreter or sys.executable
+    venv_dir = os.path.abspath(venv_dir)
+
+    with open(requirements_file, "r", encoding="utf-8") as f:
+        requirements = f.read()
+
+    template_key = None
+    if templates is not None:
+        template_key = templates.key(interpreter, requirements)
+        with instrument.phase("template clone"):
+            cloned = templates.clone(template_key, venv_dir)
+        if cloned:
+            progress(100)
+            log("Reused a cached environment with identical requirements.\n")
+            return True
+
+    created = not os.path.exists(venv_dir)
+    with instrument.phase("create venv"):
+        subprocess.run([interpreter, "-m", "venv", venv_dir], check=True)
+    progress(40)
+    if cancel is not None and cancel.is_set():
+        return _cancelled(venv_dir, created, log)
+
+    store = None
+    if use_shared_store:
+        info = probe.probe_interpreter(interpreter)
+        store = pkgstore.PackageStore()
+        tag = pkgstore.store_tag(info)
+        site_dir = pkgstore.site_packages(venv_dir, info.version)
+        with instrument.phase("store link"):
+            linked = store.link_requirements(venv_dir, tag, venvs.requirement_lines(requirements))
+        if linked:
+            log(f"Linked {len(linked)} packages from the shared package store.\n")
+
+    log("Installing dependencies...\n")
+    progress(60)
+
+    def on_line(stream, line, package, install_progress):
+        log(line)
+        progress(60 + int(40 * install_progress.fraction()))
+
+    stream = {"expected": len(venvs.requirement_lines(requirements)), "on_line": on_line, "cancel": cancel,
+              "env": dict(wheelhouse.PIP_ENV, **(pip_env or {}))}
+    python = venvs.venv_python(venv_dir)
+    with instrument.phase("install"):
+        if use_wheelhouse:
+            result = wheelhouse.Wheelhouse(wheelhouse_root).provision(python, requirements_file, log=log, **stream)
+        else:
+            result = pipstream.run_pip(python, ["install", "--progress-bar", "off", "-r", requirements_file],
+                                       **stream)
+
+    progress(100)
+
+    if result.cancelled:
+        return _cancelled(venv_dir, created, log)
+    log(_timing_summary(result.progress))
+    if result.returncode != 0:
+        log(f"Error installing dependencies: pip exited with status {result.returncode}.\n")
+        return False
+
+    if store is not None:
+        with instrument.phase("store ingest"):
+            shared = store.ingest(venv_dir, tag, site_dir)
+        if shared:
+            log(f"Added {len(shared)} packages to the shared package store.\n")
+    if templates is not None:
+        with instrument.phase("template add"):
+            templates.add(template_key, venv_dir, interpreter)
+    return True
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def cache_dir(*parts):
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "envbuilder", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def content_digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_fingerprint(filepath):
+    st = os.stat(filepath)
+    with open(filepath, "rb") as f:
+        digest = content_digest(f.read())
+    return st.st_mtime_ns, st.st_size, digest
+
+
+class ImportCache:
+    def __init__(self, path=None, tag="", max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or os.path.join(cache_dir(), "imports.sqlite3")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._pending = 0
+
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER,"
+            " digest TEXT, imports TEXT, last_used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)")
+
+        # Entries written by a different scanner version may classify imports
+        # differently, so they are dropped rather than trusted.
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'tag'").fetchone()
+        if row is None or row[0] != tag:
+            self.db.execute("DELETE FROM files")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('tag', ?)", (tag,))
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key(self, filepath):
+        return os.path.abspath(filepath)
+
+    def get(self, filepath):
+        key = self._key(filepath)
+        row = self.db.execute(
+            "SELECT mtime_ns, size, digest, imports FROM files WHERE path = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        mtime_ns, size, digest, imports = row
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            self.misses += 1
+            return None
+
+        if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+            # Touched but possibly unchanged (checkout, copy, formatter no-op):
+            # fall back to the content hash before declaring a miss.
+            if st.st_size != size:
+                self.misses += 1
+                return None
+            try:
+                new_mtime, new_size, new_digest = file_fingerprint(filepath)
+            except OSError:
+                self.misses += 1
+                return None
+            if new_digest != digest:
+                self.misses += 1
+                return None
+            self.db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?", (new_mtime, new_size, key)
+            )
+            self._pending += 1
+
+        self.hits += 1
+        self._touched[key] = time.time()
+        return set(imports.split("\n")) if imports else set()
+
+    def put(self, filepath, imports, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = file_fingerprint(filepath)
+        mtime_ns, size, digest = fingerprint
+        self.db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(filepath), mtime_ns, size, digest, "\n".join(sorted(imports)), time.time()),
+        )
+        self._pending += 1
+        if self._pending >= 1000:
+            self.flush()
+
+    def flush(self):
+        if self._touched:
+            self.db.executemany(
+                "UPDATE files SET last_used = ? WHERE path = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._evict()
+        self.db.commit()
+        self._pending = 0
+
+    def _evict(self):
+        count = self.db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            # Evict a little below the limit so every flush after the cache
+            # fills up does not pay for another eviction pass.
+            excess += self.max_entries // 10
+            self.db.execute(
+                "DELETE FROM files WHERE path IN "
+                "(SELECT path FROM files ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def clear(self):
+        self.db.execute("DELETE FROM files")
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+
+def open_default_cache(tag):
+    try:
+        return ImportCache(tag=tag)
+    except (OSError, sqlite3.Error) as e:
+        print(f"EnvBuilder: import cache disabled ({e})", file=sys.stderr)
+        return None
@@ -0,0 +1,402 @@
+import argparse
+import os
+import sys
+
+# Headless entry point for CI. Everything is imported inside the command
+# that needs it and tkinter is never imported, so `python cli.py scan` only
+# pays for the scanner; nbformat loads only if a notebook needs it.
+
+
+def _scan_with_daemon(path, follow):
+    import daemon
+
+    try:
+        reply = daemon.request("/scan", {"path": os.path.abspath(path), "follow": follow})
+    except daemon.DaemonError:
+        return None
+    errors = [tuple(error) for error in reply["errors"]]
+    for error_path, error in errors:
+        print(f"envbuilder: skipped {error_path}: {error}", file=sys.stderr)
+    return reply["imports"], errors
+
+
+def _scan(path, use_cache, workers, follow=True, use_daemon=False):
+    if use_daemon:
+        # Falls through to a local scan when no daemon answers.
+        scanned = _scan_with_daemon(path, follow)
+        if scanned is not None:
+            return scanned
+
+    import scanner
+
+    if follow and os.path.isfile(path) and not scanner.is_archive(path):
+        import modgraph
+
+        imports, errors = modgraph.scan_entry(path)
+        for error_path, error in errors:
+            print(f"envbuilder: skipped {error_path}: {error}", file=sys.stderr)
+        return sorted(imports), errors
+
+    imports = set()
+    errors = []
+    import_cache = scanner.open_cache() if use_cache else None
+    try:
+        for result in scanner.scan_path(path, workers=workers, import_cache=import_cache):
+            imports.update(result.imports)
+            if result.error:
+                errors.append((result.path, result.error))
+    finally:
+        if import_cache:
+            import_cache.close()
+    for error_path, error in errors:
+        print(f"envbuilder: skipped {error_path}: {error}", file=sys.stderr)
+    return sorted(imports), errors
+
+
+def _render(args, output_type):
+    import resolver
+
+    modules, errors = _scan(args.path, not args.no_cache, args.workers, not args.no_follow, args.daemon)
+    deps = resolver.Resolver(dict(resolver.COMMON_ALIASES), args.interpreter)
+    return _render_modules(args, deps, modules, output_type), errors
+
+
+def _render_modules(args, deps, modules, output_type):
+    import probe
+    import render
+
+    try:
+        content, lock = render.requirements_content(deps, modules, output_type, args.lock)
+    except probe.ProbeError as e:
+        raise SystemExit(f"envbuilder: {e}")
+    _report_conflicts(lock)
+    return content
+
+
+def _report_conflicts(lock):
+    for name, version, requirement, required_by in lock.conflicts if lock else []:
+        print(f"envbuilder: {name} {version} does not satisfy {requirement} from {required_by}", file=sys.stderr)
+
+
+def _write(content, output):
+    if output in (None, "-"):
+        sys.stdout.write(content)
+        return
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def command_scan(args):
+    modules, errors = _scan(args.path, not args.no_cache, args.workers, not args.no_follow, args.daemon)
+    _write("".join(f"{mod}\n" for mod in modules), args.output)
+    return 1 if errors and args.strict else 0
+
+
+def command_render(args):
+    content, errors = _render(args, args.format)
+    _write(content, args.output)
+    return 1 if errors and args.strict else 0
+
+
+def command_matrix(args):
+    import matrix
+    import resolver
+
+    modules, errors = _scan(args.path, not args.no_cache, args.workers, not args.no_follow, args.daemon)
+    deps = resolver.Resolver(dict(resolver.COMMON_ALIASES))
+    columns = matrix.build(modules, args.interpreter, deps, args.format, args.lock)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for path in matrix.write_files(columns, args.output_dir, args.format):
+        print(f"wrote {path}")
+    sys.stdout.write(matrix.summary(columns))
+    if any(column.error for column in columns):
+        return 1
+    return 1 if errors and args.strict else 0
+
+
+def command_watch(args):
+    import threading
+
+    import resolver
+    import scanner
+    import watcher
+
+    deps = resolver.Resolver(dict(resolver.COMMON_ALIASES), args.interpreter)
+    import_cache = None if args.no_cache else scanner.open_cache()
+    project = watcher.ProjectImports(args.path, import_cache, follow=not args.no_follow)
+    written = [None]
+
+    def on_update(update):
+        for error_path, error in update.errors:
+            print(f"envbuilder: skipped {error_path}: {error}", file=sys.stderr)
+        changes = [f"+{mod}" for mod in update.added] + [f"-{mod}" for mod in update.removed]
+        print(f"envbuilder: {update.rescanned} files scanned in {update.seconds * 1000:.0f} ms"
+              + (f": {' '.join(changes)}" if changes else ""), file=sys.stderr)
+        content = _render_modules(args, deps, update.imports, args.format)
+        if content != written[0]:
+            _write(content, args.output)
+            sys.stdout.flush()
+            written[0] = content
+
+    try:
+        watcher.watch(project, on_update, threading.Event(), debounce=args.debounce,
+                      polling=args.poll, log=sys.stderr.write)
+    finally:
+        if import_cache:
+            import_cache.close()
+    return 0
+
+
+def command_venv(args):
+    import tempfile
+
+    import builder
+    import venvs
+
+    content, errors = _render(args, "pip")
+    if errors and args.strict:
+        return 1
+
+    fd, requirements_file = tempfile.mkstemp(prefix="envbuilder-", suffix=".txt")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        created = builder.build_environment(
+            args.name, requirements_file,
+            interpreter=args.interpreter,
+            templates=None if args.no_templates else venvs.TemplateStore(),
+            use_wheelhouse=args.wheelhouse,
+            use_shared_store=args.shared_store,
+            log=sys.stdout.write,
+        )
+    finally:
+        os.remove(requirements_file)
+    return 0 if created else 1
+
+
+def command_batch(args):
+    import threading
+
+    import batch
+    import venvs
+
+    names = [os.path.basename(os.path.abspath(project)) for project in args.projects]
+    width = max(len(name) for name in names)
+    lock = threading.Lock()
+
+    def log(index, text):
+        if args.quiet:
+            return
+        with lock:
+            for line in text.splitlines():
+                sys.stdout.write(f"{names[index]:<{width}} | {line}\n")
+
+    results = batch.build_all(
+        args.projects, args.name,
+        workers=args.jobs,
+        interpreter=args.interpreter,
+        lock=args.lock,
+        templates=None if args.no_templates else venvs.TemplateStore(),
+        use_wheelhouse=args.wheelhouse,
+        use_shared_store=args.shared_store,
+        pip_cache=args.pip_cache,
+        log=log,
+    )
+    for name, result in zip(names, results):
+        status = "created" if result.created else result.error
+        print(f"{name:<{width}}   {status} in {result.seconds:.1f}s: {result.venv_dir}")
+    return 0 if all(result.created for result in results) else 1
+
+
+def _default_declared_file(path):
+    directory = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    for name in ("requirements.txt", "environment.yml", "environment.yaml"):
+        candidate = os.path.join(directory, name)
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _check_with_daemon(args, declared_file):
+    import daemon
+
+    payload = {"path": os.path.abspath(args.path), "follow": not args.no_follow,
+               "requirements": os.path.abspath(declared_file), "interpreter": args.interpreter,
+               "ignore": args.ignore, "allow_unused": args.allow_unused}
+    try:
+        reply = daemon.request("/check", payload)
+    except daemon.DaemonError:
+        return None
+    errors = [tuple(error) for error in reply["errors"]]
+    for error_path, error in errors:
+        print(f"envbuilder: skipped {error_path}: {error}", file=sys.stderr)
+    return reply["report"], reply["drift"], [tuple(problem) for problem in reply["problems"]], errors
+
+
+def command_check(args):
+    declared_file = args.requirements or _default_declared_file(args.path)
+    if declared_file is None:
+        print("envbuilder: no requirements.txt or environment.yml to check; pass -r FILE", file=sys.stderr)
+        return 2
+    if not os.path.isfile(declared_file):
+        print(f"envbuilder: {declared_file} is not a file", file=sys.stderr)
+        return 2
+    checked = _check_with_daemon(args, declared_file) if args.daemon else None
+    if checked is None:
+        import drift
+        import probe
+        import resolver
+
+        modules, errors = _scan(args.path, not args.no_cache, args.workers, not args.no_follow)
+        deps = resolver.Resolver(dict(resolver.COMMON_ALIASES), args.interpreter)
+        try:
+            result, problems = drift.check(modules, declared_file, deps, ignore=args.ignore,
+                                           allow_unused=args.allow_unused)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"envbuilder: cannot read {declared_file}: {e}", file=sys.stderr)
+            return 2
+        except probe.ProbeError as e:
+            raise SystemExit(f"envbuilder: {e}")
+        checked = drift.report(result, declared_file), drift.has_drift(result), problems, errors
+
+    report, drifted, problems, errors = checked
+    for where, text in problems:
+        print(f"envbuilder: {where}: cannot parse {text!r}", file=sys.stderr)
+    if drifted or not args.quiet:
+        sys.stdout.write(report)
+    if drifted or problems:
+        return 1
+    return 1 if errors and args.strict else 0
+
+
+def command_daemon(args):
+    import daemon
+
+    if args.stop or args.status:
+        try:
+            reply = daemon.request("/shutdown" if args.stop else "/status", {} if args.stop else None)
+        except daemon.DaemonError as e:
+            print(f"envbuilder: {e}", file=sys.stderr)
+            return 1
+        if args.status:
+            print(f"pid {reply['pid']}, up {reply['uptime']:.0f}s, {reply['requests']} requests")
+            for project in reply["projects"]:
+                print(f"  {project}")
+        return 0
+    try:
+        daemon.serve(args.socket, args.http, log=sys.stderr.write)
+    except daemon.DaemonError as e:
+        print(f"envbuilder: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="envbuilder",
+                                     description="Extract dependencies from Python and Jupyter files without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_source(command):
+        command.add_argument("path", help="a .py or .ipynb file, or a project folder")
+        command.add_argument("--no-cache", action="store_true", help="do not read or write the scan cache")
+        command.add_argument("--workers", type=int, default=None, help="parser processes for folder scans")
+        command.add_argument("--no-follow", action="store_true",
+                             help="for a single file, do not follow the local modules it imports")
+        command.add_argument("--strict", action="store_true", help="exit with status 1 if any file failed to parse")
+        command.add_argument("--daemon", action="store_true",
+                             help="ask a running 'envbuilder daemon' first; scan locally if none answers")
+
+    scan = commands.add_parser("scan", help="list the top-level imports")
+    add_source(scan)
+    scan.add_argument("-o", "--output", help="write to this file instead of stdout")
+    scan.set_defaults(func=command_scan)
+
+    render = commands.add_parser("render", help="write a requirements.txt or environment.yml")
+    add_source(render)
+    render.add_argument("-f", "--format", choices=("pip", "conda"), default="pip")
+    render.add_argument("-i", "--interpreter", help="resolve versions against this Python (default: this one)")
+    render.add_argument("-o", "--output", help="write to this file instead of stdout")
+    render.add_argument("--lock", action="store_true",
+                        help="pin the full installed dependency closure, not just direct imports")
+    render.set_defaults(func=command_render)
+
+    matrix = commands.add_parser("matrix", help="write one file per interpreter and show where the pins differ")
+    add_source(matrix)
+    matrix.add_argument("-i", "--interpreter", action="append", required=True,
+                        help="an interpreter to resolve against; repeat for each one")
+    matrix.add_argument("-f", "--format", choices=("pip", "conda"), default="pip")
+    matrix.add_argument("-o", "--output-dir", default=".", help="folder for the generated files")
+    matrix.add_argument("--lock", action="store_true",
+                        help="pin the full installed dependency closure, not just direct imports")
+    matrix.set_defaults(func=command_matrix)
+
+    watch = commands.add_parser("watch", help="re-render whenever a source file changes, until interrupted")
+    add_source(watch)
+    watch.add_argument("-f", "--format", choices=("pip", "conda"), default="pip")
+    watch.add_argument("-i", "--interpreter", help="resolve versions against this Python (default: this one)")
+    watch.add_argument("-o", "--output", help="rewrite this file on every change instead of printing to stdout")
+    watch.add_argument("--lock", action="store_true",
+                       help="pin the full installed dependency closure, not just direct imports")
+    watch.add_argument("--debounce", type=float, default=0.3,
+                       help="seconds of quiet to wait for after a change before re-scanning")
+    watch.add_argument("--poll", action="store_true", help="poll modification times instead of using inotify")
+    watch.set_defaults(func=command_watch)
+
+    venv = commands.add_parser("venv", help="create a virtual environment with the extracted dependencies")
+    add_source(venv)
+    venv.add_argument("name", help="directory of the new virtual environment")
+    venv.add_argument("-i", "--interpreter", help="base Python for the environment (default: this one)")
+    venv.add_argument("--lock", action="store_true", help="install the full pinned dependency closure")
+    venv.add_argument("--wheelhouse", action="store_true", help="install from the local wheelhouse")
+    venv.add_argument("--shared-store", action="store_true", help="hardlink packages from the shared package store")
+    venv.add_argument("--no-templates", action="store_true", help="do not clone or record venv templates")
+    venv.set_defaults(func=command_venv)
+
+    check = commands.add_parser("check", help="compare an existing requirements file with the scanned imports")
+    add_source(check)
+    check.add_argument("-r", "--requirements", metavar="FILE",
+                       help="requirements.txt or environment.yml to check (default: the one next to path)")
+    check.add_argument("-i", "--interpreter", help="compare versions installed for this Python (default: this one)")
+    check.add_argument("--ignore", action="append", default=[], metavar="NAME",
+                       help="a distribution to leave out of the comparison; repeat for each one")
+    check.add_argument("--allow-unused", action="store_true",
+                       help="do not fail on entries that nothing imports")
+    check.add_argument("-q", "--quiet", action="store_true", help="print nothing when there is no drift")
+    check.set_defaults(func=command_check)
+
+    server = commands.add_parser("daemon", help="keep scan results and interpreter probes warm for other commands")
+    server.add_argument("--socket", help="Unix socket to listen on (default: in the EnvBuilder cache folder)")
+    server.add_argument("--http", type=int, metavar="PORT", help="listen on 127.0.0.1:PORT instead of a Unix socket")
+    server.add_argument("--stop", action="store_true", help="stop the running daemon")
+    server.add_argument("--status", action="store_true", help="show the running daemon's state")
+    server.set_defaults(func=command_daemon)
+
+    batch = commands.add_parser("batch", help="create a virtual environment in each of several projects")
+    batch.add_argument("projects", nargs="+", help="project folders, or entry-point scripts")
+    batch.add_argument("-n", "--name", default="venv", help="environment directory inside each project")
+    batch.add_argument("-j", "--jobs", type=int, default=None, help="environments built at once (default: cores)")
+    batch.add_argument("-i", "--interpreter", help="base Python for the environments (default: this one)")
+    batch.add_argument("--lock", action="store_true", help="install the full pinned dependency closure")
+    batch.add_argument("--wheelhouse", action="store_true", help="install from the local wheelhouse")
+    batch.add_argument("--shared-store", action="store_true", help="hardlink packages from the shared package store")
+    batch.add_argument("--no-templates", action="store_true", help="do not clone or record venv templates")
+    batch.add_argument("--pip-cache", help="pip cache folder shared by every job (default: pip's own)")
+    batch.add_argument("-q", "--quiet", action="store_true", help="only print the result of each job")
+    batch.set_defaults(func=command_batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for path in getattr(args, "projects", None) or [getattr(args, "path", ".")]:
+        if not os.path.exists(path):
+            print(f"envbuilder: {path} does not exist", file=sys.stderr)
+            return 2
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+import json
+import os
+import socket
+
+import cache
+
+# The daemon keeps what every other entry point rebuilds per launch: parsed
+# projects (kept current by a file watcher), interpreter probes and the
+# alias database. Clients find it through a small state file and talk
+# JSON over HTTP, on a Unix socket where there is one, else on localhost.
+# Only this module's client half is imported by cli.py and the GUI; the
+# server imports the scanner and resolver when it starts.
+
+MAX_PROJECTS = 32
+TOKEN_HEADER = "X-EnvBuilder-Token"
+
+
+class DaemonError(Exception):
+    pass
+
+
+def state_file():
+    return os.path.join(cache.cache_dir("daemon"), "daemon.json")
+
+
+def default_socket():
+    return os.path.join(cache.cache_dir("daemon"), "envbuilder.sock")
+
+
+def read_state():
+    try:
+        with open(state_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _exchange(state, method, endpoint, body, timeout):
+    # A bare HTTP/1.0 exchange: http.client would cost a command-line
+    # client more to import than a warm daemon takes to answer.
+    if state.get("socket"):
+        sock, address = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), state["socket"]
+    else:
+        sock, address = socket.socket(socket.AF_INET, socket.SOCK_STREAM), ("127.0.0.1", state["port"])
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        head = (f"{method} {endpoint} HTTP/1.0\r\nHost: localhost\r\n{TOKEN_HEADER}: {state['token']}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        sock.sendall(head.encode("ascii") + body)
+        chunks = []
+        while True:
+            data = sock.recv(256 * 1024)
+            if not data:
+                break
+            chunks.append(data)
+    head, _, body = b"".join(chunks).partition(b"\r\n\r\n")
+    return int(head.split(None, 2)[1]), body
+
+
+def request(endpoint, payload=None, timeout=60):
+    # POSTs payload (GETs when None) to a running daemon and returns the
+    # decoded reply. Raises DaemonError when no daemon answers.
+    state = read_state()
+    if state is None:
+        raise DaemonError("no daemon is running")
+    method, body = ("GET", b"") if payload is None else ("POST", json.dumps(payload).encode("utf-8"))
+    try:
+        status, body = _exchange(state, method, endpoint, body, timeout)
+        data = json.loads(body or b"{}")
+    except (OSError, IndexError, ValueError) as e:
+        raise DaemonError(f"daemon not reachable: {e}")
+    if status != 200:
+        raise DaemonError(data.get("error") or f"daemon returned HTTP {status}")
+    return data
+
+
+def is_running():
+    try:
+        request("/status")
+    except DaemonError:
+        return False
+    return True
+
+
+class AnalysisState:
+    def __init__(self, max_projects=MAX_PROJECTS):
+        import time
+        from collections import OrderedDict
+
+        import scanner
+
+        self.max_projects = max_projects
+        self.import_cache = scanner.open_cache()
+        self.projects = OrderedDict()
+        self.resolvers = {}
+        self.started = time.time()
+        self.requests = 0
+
+    def _resolver(self, interpreter):
+        import resolver
+
+        key = interpreter or None
+        if key not in self.resolvers:
+            # The alias database is shared; the probe cache is per
+            # interpreter and checks itself for installs on every call.
+            aliases = next(iter(self.resolvers.values())).aliases if self.resolvers else None
+            self.resolvers[key] = resolver.Resolver(dict(resolver.COMMON_ALIASES), key, aliases)
+        return self.resolvers[key]
+
+    def _project(self, path, follow):
+        import watcher
+
+        key = (os.path.abspath(path), bool(follow))
+        entry = self.projects.pop(key, None)
+        if entry is None:
+            project = watcher.ProjectImports(key[0], self.import_cache, follow=follow)
+            # inotify on Linux; elsewhere polling with no interval, so every
+            # request re-stats the tree, still far cheaper than re-parsing it.
+            source = watcher.open_watcher(project.roots(), interval=0)
+            update = project.refresh()
+        else:
+            project, source = entry
+            update = project.refresh(source.changes(0))
+        self.projects[key] = (project, source)
+        while len(self.projects) > self.max_projects:
+            old_key, (old_project, old_source) = self.projects.popitem(last=False)
+            old_source.close()
+        return update
+
+    def scan(self, payload):
+        update = self._project(payload["path"], payload.get("follow", True))
+        return {"imports": update.imports, "errors": update.errors,
+                "rescanned": update.rescanned, "seconds": update.seconds}
+
+    def resolve(self, payload):
+        deps = self._resolver(payload.get("interpreter"))
+        target = deps.target()
+        versions = deps.versions(payload["modules"], target)
+        return {
+            "python": target.version_string,
+            "versions": [[mod, ver, deps.package_name(mod, target)] for mod, ver in versions],
+        }
+
+    def render(self, payload):
+        import render
+
+        scanned = self.scan(payload)
+        deps = self._resolver(payload.get("interpreter"))
+        content, lock = render.requirements_content(deps, scanned["imports"], payload.get("format", "pip"),
+                                                    payload.get("lock", False))
+        scanned["content"] = content
+        scanned["conflicts"] = lock.conflicts if lock else []
+        return scanned
+
+    def check(self, payload):
+        import drift
+
+        scanned = self.scan(payload)
+        deps = self._resolver(payload.get("interpreter"))
+        result, problems = drift.check(scanned["imports"], payload["requirements"], deps,
+                                       ignore=payload.get("ignore", ()), allow_unused=payload.get("allow_unused", False))
+        scanned["report"] = drift.report(result, payload["requirements"])
+        scanned["drift"] = drift.has_drift(result)
+        scanned["problems"] = problems
+        return scanned
+
+    def status(self, payload=None):
+        import time
+
+        return {"pid": os.getpid(), "uptime": time.time() - self.started, "requests": self.requests,
+                "projects": [path for path, follow in self.projects]}
+
+    def close(self):
+        for project, source in self.projects.values():
+            source.close()
+        self.projects.clear()
+        if self.import_cache:
+            self.import_cache.close()
+
+
+def _handler_class(state, token):
+    import http.server
+    import threading
+
+    import probe
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        routes = {"/scan": state.scan, "/resolve": state.resolve, "/render": state.render, "/check": state.check,
+                  "/status": state.status}
+
+        def log_message(self, format, *args):
+            pass
+
+        def address_string(self):
+            return "local"
+
+        def _reply(self, status, data):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, payload):
+            if self.headers.get(TOKEN_HEADER) != token:
+                self._reply(403, {"error": "bad token"})
+                return
+            if self.path == "/shutdown":
+                self._reply(200, {"stopping": True})
+                # shutdown() waits for serve_forever, which is running this
+                # request, so it has to come from another thread.
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            route = self.routes.get(self.path)
+            if route is None:
+                self._reply(404, {"error": f"unknown endpoint {self.path}"})
+                return
+            state.requests += 1
+            try:
+                self._reply(200, route(payload))
+            except (KeyError, TypeError, ValueError) as e:
+                self._reply(400, {"error": f"bad request: {e}"})
+            except (OSError, probe.ProbeError) as e:
+                self._reply(500, {"error": str(e)})
+
+        def do_GET(self):
+            self._handle({})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {"error": "body is not JSON"})
+                return
+            self._handle(payload)
+
+    return Handler
+
+
+def _write_state(info):
+    path = state_file()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # The token in it is what keeps other local users out of the HTTP port.
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(tmp_path, path)
+
+
+def serve(socket_path=None, port=None, max_projects=MAX_PROJECTS, log=None):
+    # Runs until a /shutdown request or KeyboardInterrupt. Requests are
+    # handled one at a time: the warm state is not shared between threads,
+    # and a warm request takes milliseconds.
+    import http.server
+    import secrets
+    import socketserver
+
+    if is_running():
+        raise DaemonError(f"a daemon is already running (pid {read_state().get('pid')})")
+
+    state = AnalysisState(max_projects)
+    token = secrets.token_hex(16)
+    handler = _handler_class(state, token)
+    if port is None and hasattr(socket, "AF_UNIX"):
+        socket_path = os.path.abspath(socket_path or default_socket())
+        if os.path.exists(socket_path):
+            # Left behind by a daemon that did not shut down cleanly.
+            os.remove(socket_path)
+        server = socketserver.UnixStreamServer(socket_path, handler)
+        os.chmod(socket_path, 0o600)
+        info = {"socket": socket_path}
+    else:
+        server = http.server.HTTPServer(("127.0.0.1", port or 0), handler)
+        info = {"port": server.server_address[1]}
+    info.update(pid=os.getpid(), token=token)
+    _write_state(info)
+    if log:
+        where = info.get("socket") or f"http://127.0.0.1:{info['port']}"
+        log(f"EnvBuilder daemon {os.getpid()} listening on {where}\n")
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        state.close()
+        if read_state() == info:
+            os.remove(state_file())
+        if info.get("socket") and os.path.exists(info["socket"]):
+            os.remove(info["socket"])
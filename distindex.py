@@ -0,0 +1,158 @@
+import csv
+import importlib.metadata
+import os
+import platform
+import re
+import sys
+import threading
+
+# Kept importable on Python 3.8, the oldest target EnvBuilder supports
+# (importlib.metadata is new in 3.8): probe.py runs collect_distributions
+# inside whatever Python the user points EnvBuilder at.
+
+_NON_MODULE_DIRS = (".dist-info", ".egg-info", ".data")
+_EXTENSION_SUFFIXES = (".so", ".pyd")
+
+
+def normalize_name(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _record_paths(text):
+    for line in text.splitlines():
+        if not line:
+            continue
+        if line.startswith('"'):
+            yield next(csv.reader([line]))[0]
+        else:
+            yield line.split(",", 1)[0]
+
+
+def import_names(dist):
+    text = dist.read_text("top_level.txt")
+    if text:
+        return sorted({line.strip().split("/")[0] for line in text.splitlines() if line.strip()})
+
+    # Wheels built by flit, hatch, poetry and friends have no top_level.txt,
+    # so the importable names are recovered from RECORD instead.
+    names = set()
+    for path in _record_paths(dist.read_text("RECORD") or ""):
+        top = path.replace("\\", "/").split("/")[0]
+        if not top or top.startswith("..") or top == "__pycache__" or top.endswith(_NON_MODULE_DIRS):
+            continue
+        if "/" in path.replace("\\", "/"):
+            name = top
+        elif top.endswith(".py"):
+            name = top[:-3]
+        elif top.endswith(_EXTENSION_SUFFIXES):
+            name = top.split(".")[0]
+        else:
+            continue
+        if name.isidentifier():
+            names.add(name)
+    return sorted(names)
+
+
+def collect_distributions(path=None):
+    found = []
+    seen = set()
+    for dist in importlib.metadata.distributions(**({"path": path} if path is not None else {})):
+        metadata = dist.metadata
+        name = metadata["Name"]
+        if not name or normalize_name(name) in seen:
+            continue
+        seen.add(normalize_name(name))
+        # Reading Requires-Dist from the metadata already parsed saves a
+        # second parse; only legacy eggs keep them in requires.txt.
+        requires = metadata.get_all("Requires-Dist")
+        if requires is None:
+            requires = dist.requires or []
+        found.append((name, metadata["Version"], import_names(dist), list(requires)))
+    return found
+
+
+def marker_environment():
+    # The values PEP 508 markers are evaluated against, for this interpreter.
+    info = sys.implementation.version
+    implementation_version = "%d.%d.%d" % (info.major, info.minor, info.micro)
+    if info.releaselevel != "final":
+        implementation_version += info.releaselevel[0] + str(info.serial)
+    return {
+        "implementation_name": sys.implementation.name,
+        "implementation_version": implementation_version,
+        "os_name": os.name,
+        "platform_machine": platform.machine(),
+        "platform_python_implementation": platform.python_implementation(),
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "python_full_version": platform.python_version(),
+        "python_version": ".".join(platform.python_version_tuple()[:2]),
+        "sys_platform": sys.platform,
+    }
+
+
+def stdlib_names():
+    if hasattr(sys, "stdlib_module_names"):
+        return set(sys.stdlib_module_names)
+    import pkgutil
+    import sysconfig
+    stdlib_dir = sysconfig.get_paths()["stdlib"]
+    names = set(sys.builtin_module_names)
+    for module in pkgutil.iter_modules([stdlib_dir, os.path.join(stdlib_dir, "lib-dynload")]):
+        names.add(module.name)
+    names.discard("site-packages")
+    return names
+
+
+class DistributionIndex:
+    def __init__(self, distributions):
+        self.modules = {}
+        self.distributions = {}
+        self.requirements = {}
+        # Earlier sys.path entries shadow later ones, as they do for imports.
+        for name, version, modules, requires in distributions:
+            key = normalize_name(name)
+            if key not in self.distributions:
+                self.distributions[key] = (name, version)
+                self.requirements[key] = requires
+            for module in modules:
+                self.modules.setdefault(module, (name, version))
+
+    def lookup(self, module):
+        return self.modules.get(module)
+
+    def distribution(self, name):
+        return self.distributions.get(normalize_name(name))
+
+    def version(self, name):
+        found = self.distribution(name)
+        return found[1] if found else None
+
+    def requires(self, name):
+        return self.requirements.get(normalize_name(name), [])
+
+
+def _path_signature(paths):
+    signature = []
+    for entry in paths:
+        try:
+            signature.append((entry, os.stat(entry or ".").st_mtime_ns))
+        except OSError:
+            signature.append((entry, None))
+    return tuple(signature)
+
+
+_lock = threading.Lock()
+_cached = None
+
+
+def get_index():
+    # Installing or removing a distribution adds or deletes a *.dist-info
+    # directory, which bumps the mtime of the site-packages entry it lives in.
+    global _cached
+    signature = _path_signature(sys.path)
+    with _lock:
+        if _cached is None or _cached[0] != signature:
+            _cached = (signature, DistributionIndex(collect_distributions()))
+        return _cached[1]
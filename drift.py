@@ -0,0 +1,245 @@
+import os
+import re
+from collections import namedtuple
+
+import distindex
+import lockfile
+import render
+
+# name is the normalized distribution name, text the entry as written;
+# specifier and marker are packaging objects or None. where is "file:line".
+Entry = namedtuple("Entry", ["name", "text", "specifier", "marker", "where"])
+# missing: (package, installed version or None, import names) for imports
+# the file does not declare. unused: Entries nothing imports. mismatched:
+# (Entry, installed version). transitive: unused Entries that an imported
+# distribution requires, i.e. what a lock file is expected to pin.
+Drift = namedtuple("Drift", ["missing", "unused", "mismatched", "transitive"])
+
+_COMMENT = re.compile(r"(^|\s+)#.*$")
+# Import names EnvBuilder writes for modules it cannot map, e.g.
+# __builtin__, are not valid PEP 508 names but still name an entry.
+_BARE_NAME = re.compile(r"^[\w.\-]+$")
+_CONDA_SPEC = re.compile(r"^(?:[\w.\-]+::)?([A-Za-z0-9][\w.\-]*)\s*(.*)$")
+# Entries in environment.yml that are not distributions anything imports.
+_CONDA_TOOLS = {"python", "pip"}
+
+
+def is_conda_file(path):
+    return path.lower().endswith((".yml", ".yaml"))
+
+
+def _logical_lines(path):
+    # pip joins lines ending in a backslash before stripping comments.
+    with open(path, "r", encoding="utf-8") as f:
+        pending, start = "", None
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if start is None:
+                start = number
+            if line.endswith("\\"):
+                pending += line[:-1]
+                continue
+            yield start, pending + line
+            pending, start = "", None
+        if pending:
+            yield start, pending
+
+
+def _option_value(line, short, long):
+    for flag in (short, long):
+        if line.startswith(flag + "=") or line.startswith(flag + " "):
+            return line[len(flag) + 1:].strip()
+    return None
+
+
+def _requirement(text, where, entries, problems, written=None):
+    requirements = lockfile.packaging_modules()[1]
+    try:
+        req = requirements.Requirement(text)
+    except requirements.InvalidRequirement:
+        if _BARE_NAME.match(text):
+            entries.append(Entry(distindex.normalize_name(text), written or text, None, None, where))
+        else:
+            problems.append((where, text))
+        return
+    entries.append(Entry(distindex.normalize_name(req.name), written or text, req.specifier or None, req.marker, where))
+
+
+def read_requirements(path, _seen=None):
+    # Returns (entries, problems), following -r includes. Options, -c
+    # constraints and editables without an #egg= name declare nothing
+    # that can be compared by name.
+    path = os.path.abspath(path)
+    seen = _seen if _seen is not None else set()
+    entries, problems = [], []
+    if path in seen:
+        return entries, problems
+    seen.add(path)
+    for number, line in _logical_lines(path):
+        line = _COMMENT.sub("", line).strip()
+        where = f"{os.path.basename(path)}:{number}"
+        if not line:
+            continue
+        include = _option_value(line, "-r", "--requirement")
+        if include is not None:
+            found, bad = read_requirements(os.path.join(os.path.dirname(path), include), seen)
+            entries.extend(found)
+            problems.extend(bad)
+            continue
+        editable = _option_value(line, "-e", "--editable")
+        if editable is not None:
+            egg = editable.partition("#egg=")[2].split("&")[0]
+            if egg:
+                _requirement(egg, where, entries, problems)
+            continue
+        if not line.startswith("-"):
+            _requirement(line, where, entries, problems)
+    return entries, problems
+
+
+def _conda_requirement(spec, where, entries, problems):
+    match = _CONDA_SPEC.match(spec)
+    if match is None:
+        problems.append((where, spec))
+        return
+    name, version = match.group(1), match.group(2).strip()
+    if name.lower() in _CONDA_TOOLS:
+        return
+    # "=1.2" and "1.2" mean 1.2.* to conda; a third field is a build string.
+    # Alternatives ("1.2|1.4") have no PEP 440 form and are checked by
+    # name only.
+    version = version.replace(" ", "")
+    if "|" in version:
+        version = ""
+    elif version.startswith("=") and not version.startswith("=="):
+        version = version[1:].split("=")[0]
+        version = f"=={version}" if version.endswith("*") else f"=={version}.*"
+    elif version and version[0].isdigit():
+        version = f"=={version.split('=')[0]}"
+        version = version if version.endswith("*") else f"{version}.*"
+    _requirement(f"{name}{version}", where, entries, problems, spec)
+
+
+def read_environment_file(path):
+    # The dependencies list of an environment.yml, including a nested pip
+    # list, read line by line: PyYAML is not a dependency, and the format
+    # EnvBuilder and conda write is this narrow.
+    entries, problems = [], []
+    in_dependencies, pip_indent = False, None
+    name = os.path.basename(path)
+    for number, line in _logical_lines(path):
+        line = _COMMENT.sub("", line).rstrip()
+        text = line.strip()
+        if not text:
+            continue
+        indent = len(line) - len(line.lstrip())
+        if indent == 0:
+            in_dependencies, pip_indent = text == "dependencies:", None
+            continue
+        if not in_dependencies or not text.startswith("-"):
+            continue
+        spec = text[1:].strip()
+        if len(spec) > 1 and spec[0] == spec[-1] and spec[0] in "'\"":
+            spec = spec[1:-1]
+        where = f"{name}:{number}"
+        if pip_indent is not None and indent > pip_indent:
+            _requirement(spec, where, entries, problems)
+            continue
+        pip_indent = None
+        if spec.rstrip().endswith(":"):
+            # "- pip:" opens a list of pip requirements.
+            pip_indent = indent
+        else:
+            _conda_requirement(spec, where, entries, problems)
+    return entries, problems
+
+
+def read_file(path):
+    if is_conda_file(path):
+        return read_environment_file(path)
+    return read_requirements(path)
+
+
+def _applies(entry, markers):
+    if entry.marker is None:
+        return True
+    markers_module = lockfile.packaging_modules()[0]
+    try:
+        return entry.marker.evaluate(dict(markers, extra=""))
+    except (markers_module.UndefinedComparison, markers_module.UndefinedEnvironmentName):
+        return True
+
+
+def compare(modules, entries, deps, target=None, ignore=()):
+    # modules is a scan result; versions are checked against what is
+    # installed for target (deps.target() by default).
+    target = target or deps.target()
+    ignored = {distindex.normalize_name(name) for name in ignore}
+    imported = {}
+    for mod, ver in deps.versions(modules, target):
+        if not render.is_external(mod, ver):
+            continue
+        package = deps.package_name(mod, target)
+        key = distindex.normalize_name(package)
+        if key not in ignored:
+            imported.setdefault(key, (package, ver or None, []))[2].append(mod)
+
+    declared = {}
+    for entry in entries:
+        if entry.name not in ignored and _applies(entry, target.markers):
+            declared.setdefault(entry.name, entry)
+
+    missing = [imported[key] for key in sorted(imported) if key not in declared]
+    mismatched = []
+    for key in sorted(declared):
+        entry = declared[key]
+        installed = target.index.version(key)
+        if installed and entry.specifier is not None and not entry.specifier.contains(installed, prereleases=True):
+            mismatched.append((entry, installed))
+
+    unused = [declared[key] for key in sorted(declared) if key not in imported]
+    transitive = []
+    if unused:
+        # Only walked when needed: a file listing direct imports alone
+        # never pays for the closure.
+        closure = lockfile.lock(target, [package for package, ver, mods in imported.values()])
+        pinned = {distindex.normalize_name(name) for name, version in closure.pins}
+        transitive = [entry for entry in unused if entry.name in pinned]
+        unused = [entry for entry in unused if entry.name not in pinned]
+    return Drift(missing, unused, mismatched, transitive)
+
+
+def check(modules, path, deps, target=None, ignore=(), allow_unused=False):
+    # Reads path and compares it in one step. Returns (Drift, problems).
+    entries, problems = read_file(path)
+    drift = compare(modules, entries, deps, target, ignore)
+    if allow_unused:
+        drift = drift._replace(unused=[])
+    return drift, problems
+
+
+def has_drift(drift):
+    return bool(drift.missing or drift.unused or drift.mismatched)
+
+
+def report(drift, path):
+    name = os.path.basename(path)
+    lines = []
+    if drift.missing:
+        lines.append(f"Imported but missing from {name}:")
+        for package, version, modules in drift.missing:
+            installed = version or "not installed"
+            lines.append(f"  {package} ({installed}), imported as {', '.join(sorted(modules))}")
+    if drift.unused:
+        lines.append(f"In {name} but never imported:")
+        for entry in drift.unused:
+            lines.append(f"  {entry.text}  ({entry.where})")
+    if drift.mismatched:
+        lines.append(f"Pinned in {name} but a different version is installed:")
+        for entry, installed in drift.mismatched:
+            lines.append(f"  {entry.text}  ({entry.where}), installed {installed}")
+    if not lines:
+        lines.append(f"{name} matches the scanned imports.")
+    if drift.transitive:
+        lines.append(f"{len(drift.transitive)} further entries are dependencies of imported packages.")
+    return "\n".join(lines) + "\n"
@@ -1,14 +1,30 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
-import ast
-import nbformat
-import importlib.metadata
-import subprocess
-import sys
+import queue
+import tempfile
 import threading
 import time
 
+import batch
+import builder
+import daemon
+import drift
+import instrument
+import lockfile
+import matrix
+import modgraph
+import probe
+import render
+import resolver
+import scanner
+import venvs
+import watcher
+
+UI_FRAME_MS = 16
+UI_BATCH_SECONDS = 0.008
+MAX_OUTPUT_LINES = 5000
+
 class ToolTip:
     def __init__(self, widget, text):
         self.widget = widget
@@ -47,31 +63,28 @@ class EnvBuilder:
         self.output_type = tk.StringVar(value="pip")
         self.venv_name = tk.StringVar(value="venv")
         self.include_comments = tk.BooleanVar(value=True)   
+        self.use_wheelhouse = False
+        self.use_shared_store = False
+        self.lock_closure = False
+        self.profile_runs = False
+        self.use_daemon = False
+        self.watch_stop = None
+        self.last_timings = None
+        self.matrix_interpreters = []
+        self.last_modules = None
+        self.cancel_event = None
+        self.ui_queue = queue.Queue()
+        self.buttons = []
         
-        self.import_to_package = {
-            "PIL": "Pillow",
-            "cv2": "opencv-python",
-            "skimage": "scikit-image",
-            "sklearn": "scikit-learn",
-            "plt": "matplotlib",
-            "np": "numpy",
-            "pd": "pandas",
-        }
-
-        self.standard_libs = {
-            "tkinter", "os", "ast", "importlib",  
-            "pickle", "random", "datetime", "time", "json", 
-            "csv", "math", "re", "sys", "collections", 
-            "itertools", "functools", "io", "pathlib", "shutil",
-            "threading", "multiprocessing", "subprocess", "argparse",
-            "logging", "unittest", "xml", "html", "urllib", "http",
-            "socket", "email", "calendar", "zlib", "gzip", "zipfile",
-            "tarfile", "hashlib", "copy", "string", "textwrap", "struct"
-        }
+        self.import_to_package = dict(resolver.COMMON_ALIASES)
+
+        self.resolver = resolver.Resolver(self.import_to_package)
+        self.templates = venvs.TemplateStore()
 
         self.setup_style()
         self.setup_menu()
         self.setup_gui()
+        self.root.after(UI_FRAME_MS, self._drain_ui_queue)
 
     def setup_menu(self):
         self.root.config(menu="")
@@ -91,6 +104,30 @@ class EnvBuilder:
                            command=self.show_about_dialog)
         help_btn.pack(side=tk.LEFT)
         
+        timings_btn = tk.Button(menu_frame, text="Timings", bg='#2e2e2e', fg='#ffffff',
+                              activebackground='#4e4e4e', activeforeground='#ffffff',
+                              relief=tk.FLAT, bd=0, padx=10, pady=5,
+                              command=self.show_timings_dialog)
+        timings_btn.pack(side=tk.LEFT)
+        
+        matrix_btn = tk.Button(menu_frame, text="Matrix", bg='#2e2e2e', fg='#ffffff',
+                              activebackground='#4e4e4e', activeforeground='#ffffff',
+                              relief=tk.FLAT, bd=0, padx=10, pady=5,
+                              command=self.open_matrix_dialog)
+        matrix_btn.pack(side=tk.LEFT)
+        
+        batch_btn = tk.Button(menu_frame, text="Batch", bg='#2e2e2e', fg='#ffffff',
+                              activebackground='#4e4e4e', activeforeground='#ffffff',
+                              relief=tk.FLAT, bd=0, padx=10, pady=5,
+                              command=self.open_batch_dialog)
+        batch_btn.pack(side=tk.LEFT)
+        
+        check_btn = tk.Button(menu_frame, text="Check", bg='#2e2e2e', fg='#ffffff',
+                              activebackground='#4e4e4e', activeforeground='#ffffff',
+                              relief=tk.FLAT, bd=0, padx=10, pady=5,
+                              command=self.check_existing_file)
+        check_btn.pack(side=tk.LEFT)
+        
         dark_line = tk.Frame(self.root, height=1, bg='#1a1a1a')
         dark_line.pack(side=tk.TOP, fill=tk.X)
         
@@ -161,7 +198,7 @@ class EnvBuilder:
     def open_config_dialog(self):
         config_dialog = tk.Toplevel(self.root)
         config_dialog.title("Configuration Options")
-        config_dialog.geometry("450x400")
+        config_dialog.geometry("450x600")
         config_dialog.configure(bg="#2e2e2e")
         config_dialog.resizable(False, False)
         
@@ -211,12 +248,47 @@ class EnvBuilder:
         
         ttk.Label(options_frame, text="Options:").pack(anchor="w")
         
-        include_comments_var = tk.BooleanVar(value=True)
+        include_comments_var = tk.BooleanVar(value=self.include_comments.get())
         include_comments_check = ttk.Checkbutton(options_frame, text="Include comments in requirements file", 
                                                variable=include_comments_var)
         include_comments_check.pack(anchor="w", padx=10, pady=5)
         
         ToolTip(include_comments_check, "Check this box to include comments in the requirements file")
+
+        wheelhouse_var = tk.BooleanVar(value=self.use_wheelhouse)
+        wheelhouse_check = ttk.Checkbutton(options_frame, text="Install from local wheelhouse (offline after first run)",
+                                           variable=wheelhouse_var)
+        wheelhouse_check.pack(anchor="w", padx=10, pady=5)
+
+        ToolTip(wheelhouse_check, "Build wheels for the requirements once into a local folder and install from it without contacting the package index")
+
+        shared_store_var = tk.BooleanVar(value=self.use_shared_store)
+        shared_store_check = ttk.Checkbutton(options_frame, text="Share installed packages between environments",
+                                             variable=shared_store_var)
+        shared_store_check.pack(anchor="w", padx=10, pady=5)
+
+        ToolTip(shared_store_check, "Keep one copy of each installed package in a shared store and hardlink it into every new environment")
+
+        lock_closure_var = tk.BooleanVar(value=self.lock_closure)
+        lock_closure_check = ttk.Checkbutton(options_frame, text="Pin the full dependency closure (lock file)",
+                                             variable=lock_closure_var)
+        lock_closure_check.pack(anchor="w", padx=10, pady=5)
+
+        ToolTip(lock_closure_check, "Also pin every installed distribution the imported packages depend on, evaluated for the selected interpreter")
+
+        profile_var = tk.BooleanVar(value=self.profile_runs)
+        profile_check = ttk.Checkbutton(options_frame, text="Capture a cProfile profile of each run",
+                                        variable=profile_var)
+        profile_check.pack(anchor="w", padx=10, pady=5)
+
+        ToolTip(profile_check, "Adds a function-level profile to the Timings window; runs are noticeably slower while enabled")
+
+        daemon_var = tk.BooleanVar(value=self.use_daemon)
+        daemon_check = ttk.Checkbutton(options_frame, text="Scan through the analysis daemon when it is running",
+                                       variable=daemon_var)
+        daemon_check.pack(anchor="w", padx=10, pady=5)
+
+        ToolTip(daemon_check, "Start it with 'python cli.py daemon'; projects it has already seen are re-scanned in milliseconds")
         
         separator = ttk.Separator(config_dialog, orient='horizontal')
         separator.pack(fill=tk.X, pady=10)
@@ -226,7 +298,12 @@ class EnvBuilder:
         
         save_btn = ttk.Button(button_frame, text="Save", width=10,
                             command=lambda: self.save_config(interpreter_path.get(), save_path.get(), 
-                                                           include_comments_var.get(), config_dialog))
+                                                           include_comments_var.get(), config_dialog,
+                                                           use_wheelhouse=wheelhouse_var.get(),
+                                                           use_shared_store=shared_store_var.get(),
+                                                           lock_closure=lock_closure_var.get(),
+                                                           profile_runs=profile_var.get(),
+                                                           use_daemon=daemon_var.get()))
         save_btn.pack(side=tk.RIGHT, padx=5)
         
         cancel_btn = ttk.Button(button_frame, text="Cancel", width=10,
@@ -253,20 +330,252 @@ class EnvBuilder:
             entry_widget.delete(0, tk.END)
             entry_widget.insert(0, filename)
     
+    def open_matrix_dialog(self):
+        if not self.last_modules:
+            messagebox.showwarning("No Content", "Please generate the environment file first.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Interpreter Matrix")
+        dialog.geometry("520x360")
+        dialog.configure(bg="#2e2e2e")
+
+        ttk.Label(dialog, text="Interpreters, one path per line:").pack(anchor="w", padx=10, pady=(10, 0))
+        paths_text = tk.Text(dialog, height=8, bg="#3e3e3e", fg="#ffffff")
+        paths_text.insert(tk.END, "\n".join(self.matrix_interpreters))
+        paths_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        ToolTip(paths_text, "Each interpreter gets its own file, resolved against its own standard library and packages")
+
+        button_frame = tk.Frame(dialog, bg="#2e2e2e")
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        def add_interpreter():
+            filename = filedialog.askopenfilename(title="Select Python Interpreter")
+            if filename:
+                current = paths_text.get(1.0, tk.END).strip()
+                paths_text.delete(1.0, tk.END)
+                paths_text.insert(tk.END, f"{current}\n{filename}" if current else filename)
+
+        def generate():
+            interpreters = [line.strip() for line in paths_text.get(1.0, tk.END).splitlines() if line.strip()]
+            if not interpreters:
+                messagebox.showwarning("No Interpreters", "Please add at least one interpreter.", parent=dialog)
+                return
+            directory = filedialog.askdirectory(title="Select Folder for the Generated Files",
+                                                initialdir=getattr(self, "default_save_path", None) or None)
+            if not directory:
+                return
+            self.matrix_interpreters = interpreters
+            dialog.destroy()
+            self.generate_matrix(interpreters, directory)
+
+        ttk.Button(button_frame, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Generate", command=generate).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Add Interpreter...", command=add_interpreter).pack(side=tk.LEFT)
+
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+    def generate_matrix(self, interpreters, directory):
+        self.disable_buttons()
+        self.progress['value'] = 0
+        self.update_output(f"\nProbing {len(interpreters)} interpreters...\n")
+        args = (list(self.last_modules), interpreters, directory, self.output_type.get())
+        thread = threading.Thread(target=self._matrix_thread, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def _matrix_thread(self, modules, interpreters, directory, output_type):
+        try:
+            columns = matrix.build(modules, interpreters, self.resolver, output_type, self.lock_closure)
+            for path in matrix.write_files(columns, directory, output_type):
+                self.update_output(f"Wrote {path}\n")
+            self.update_output(matrix.summary(columns))
+        except Exception as e:
+            self.update_output(f"Error generating the matrix: {str(e)}\n")
+        finally:
+            self.ui_queue.put(("done", None))
+
+    def check_existing_file(self):
+        if not self.last_modules:
+            messagebox.showwarning("No Content", "Please generate the environment file first.")
+            return
+        source = self.file_path.get()
+        initialdir = source if os.path.isdir(source) else os.path.dirname(source)
+        filename = filedialog.askopenfilename(
+            title="Select Requirements or Environment File",
+            initialdir=initialdir or None,
+            filetypes=[("Environment files", "*.txt *.yml *.yaml"), ("All files", "*.*")],
+        )
+        if not filename:
+            return
+        self.disable_buttons()
+        self.update_output(f"\nChecking {filename}...\n")
+        thread = threading.Thread(target=self._check_thread, args=(list(self.last_modules), filename))
+        thread.daemon = True
+        thread.start()
+
+    def _check_thread(self, modules, filename):
+        try:
+            result, problems = drift.check(modules, filename, self.resolver)
+            for where, text in problems:
+                self.update_output(f"{where}: cannot parse {text!r}\n")
+            self.update_output(drift.report(result, filename))
+        except Exception as e:
+            self.update_output(f"Error checking {filename}: {str(e)}\n")
+        finally:
+            self.ui_queue.put(("done", None))
+
+    def open_batch_dialog(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Batch Virtual Environments")
+        dialog.geometry("640x480")
+        dialog.configure(bg="#2e2e2e")
+
+        ttk.Label(dialog, text="Project folders, one per line:").pack(anchor="w", padx=10, pady=(10, 0))
+        paths_text = tk.Text(dialog, height=6, bg="#3e3e3e", fg="#ffffff")
+        paths_text.pack(fill=tk.X, padx=10, pady=5)
+        ToolTip(paths_text, "Each project gets its own environment, built from its own imports")
+
+        name_frame = tk.Frame(dialog, bg="#2e2e2e")
+        name_frame.pack(fill=tk.X, padx=10)
+        ttk.Label(name_frame, text="Environment name:").pack(side=tk.LEFT, padx=(0, 5))
+        name_entry = ttk.Entry(name_frame, width=20)
+        name_entry.insert(0, self.venv_name.get())
+        name_entry.pack(side=tk.LEFT)
+        ToolTip(name_entry, "Directory created inside each project")
+
+        tree = ttk.Treeview(dialog, columns=("project", "status", "progress"), show="headings", height=8)
+        tree.heading("project", text="Project")
+        tree.heading("status", text="Status")
+        tree.heading("progress", text="Progress")
+        tree.column("project", width=340)
+        tree.column("status", width=180)
+        tree.column("progress", width=80, anchor="e")
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        button_frame = tk.Frame(dialog, bg="#2e2e2e")
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+
+        def add_folder():
+            folder = filedialog.askdirectory(title="Select Project Folder", parent=dialog)
+            if folder:
+                paths_text.insert(tk.END, ("\n" if paths_text.get(1.0, tk.END).strip() else "") + folder)
+
+        def build():
+            projects = [line.strip() for line in paths_text.get(1.0, tk.END).splitlines() if line.strip()]
+            missing = [project for project in projects if not os.path.exists(project)]
+            if not projects or missing:
+                messagebox.showwarning("Projects", f"Not found: {missing[0]}" if missing
+                                       else "Please add at least one project folder.", parent=dialog)
+                return
+            venv_name = name_entry.get().strip()
+            if not venv_name:
+                messagebox.showwarning("No Name", "Please enter a name for the virtual environments.", parent=dialog)
+                return
+            tree.delete(*tree.get_children())
+            for index, project in enumerate(projects):
+                tree.insert("", tk.END, iid=str(index), values=(project, "queued", "0%"))
+            build_btn.configure(state='disabled')
+            self.start_batch(projects, venv_name, tree, build_btn)
+
+        close_btn = ttk.Button(button_frame, text="Close", command=dialog.destroy)
+        close_btn.pack(side=tk.RIGHT, padx=5)
+        build_btn = ttk.Button(button_frame, text="Build", command=build)
+        build_btn.pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Add Folder...", command=add_folder).pack(side=tk.LEFT)
+
+        dialog.transient(self.root)
+
+    def start_batch(self, projects, venv_name, tree, build_btn):
+        self.progress['value'] = 0
+        self.disable_buttons()
+        self.cancel_event = threading.Event()
+        self.cancel_btn.configure(state='normal')
+        self.update_output(f"\nBuilding {len(projects)} environments with up to "
+                           f"{batch.default_workers(len(projects))} at a time...\n")
+        thread = threading.Thread(target=self._batch_thread, args=(projects, venv_name, tree, build_btn))
+        thread.daemon = True
+        thread.start()
+
+    def _batch_thread(self, projects, venv_name, tree, build_btn):
+        names = [os.path.basename(os.path.abspath(project)) for project in projects]
+        percent = [0] * len(projects)
+
+        def set_row(index, status, value):
+            # The dialog may have been closed while the batch runs.
+            if tree.winfo_exists():
+                tree.item(str(index), values=(projects[index], status, f"{value}%"))
+
+        def enable_build():
+            if build_btn.winfo_exists():
+                build_btn.configure(state='normal')
+
+        def progress(index, value):
+            if value == percent[index]:
+                return
+            percent[index] = value
+            self.call_in_ui(lambda: set_row(index, "running", value))
+            self._set_thread_progress(sum(percent) // len(percent))
+
+        def log(index, text):
+            self.update_output("".join(f"[{names[index]}] {line}\n" for line in text.splitlines()))
+
+        try:
+            results = batch.build_all(
+                projects, venv_name,
+                interpreter=self.resolver.interpreter,
+                lock=self.lock_closure,
+                templates=self.templates,
+                use_wheelhouse=self.use_wheelhouse,
+                use_shared_store=self.use_shared_store,
+                log=log,
+                progress=progress,
+                cancel=self.cancel_event,
+            )
+            for index, result in enumerate(results):
+                status = "created" if result.created else result.error
+                self.call_in_ui(lambda index=index, status=status: set_row(index, status, 100))
+                self.update_output(f"[{names[index]}] {status} in {result.seconds:.1f}s\n")
+            created = sum(1 for result in results if result.created)
+            self.update_output(f"{created} of {len(results)} environments created.\n")
+        except Exception as e:
+            self.update_output(f"Error building environments: {str(e)}\n")
+        finally:
+            self.call_in_ui(enable_build)
+            self.ui_queue.put(("done", None))
+
     def browse_folder(self, entry_widget):
         folder = filedialog.askdirectory(title="Select Default Save Folder")
         if folder:
             entry_widget.delete(0, tk.END)
             entry_widget.insert(0, folder)
     
-    def save_config(self, interpreter_path, save_path, include_comments, dialog):
+    def save_config(self, interpreter_path, save_path, include_comments, dialog, use_wheelhouse=False,
+                    use_shared_store=False, lock_closure=False, profile_runs=False, use_daemon=False):
+        if interpreter_path:
+            try:
+                info = probe.probe_interpreter(interpreter_path)
+            except probe.ProbeError as e:
+                messagebox.showerror("Invalid Interpreter", str(e))
+                return
+
         self.python_interpreter = interpreter_path
+        self.resolver.interpreter = interpreter_path or None
         self.default_save_path = save_path
-        self.include_comments = include_comments
+        self.include_comments.set(include_comments)
+        self.use_wheelhouse = use_wheelhouse
+        self.use_shared_store = use_shared_store
+        self.lock_closure = lock_closure
+        self.profile_runs = profile_runs
+        self.use_daemon = use_daemon
         
         dialog.destroy()
         
-        messagebox.showinfo("Configuration Saved", "Your settings have been saved successfully.")
+        message = "Your settings have been saved successfully."
+        if interpreter_path:
+            message += f"\nDependencies will be resolved against Python {info.version_string} ({info.executable})."
+        messagebox.showinfo("Configuration Saved", message)
 
     def setup_style(self):
         style = ttk.Style()
@@ -291,24 +600,30 @@ class EnvBuilder:
         button_frame.pack(fill=tk.X, pady=10)
 
         self.create_generate_button(button_frame)
+        self.create_watch_button(button_frame)
         self.create_save_button(button_frame)
         self.create_venv_button(button_frame)
+        self.create_cancel_button(button_frame)
 
         self.progress = ttk.Progressbar(frame, orient='horizontal', length=300, mode='determinate')
         self.progress.pack(pady=10)
         ToolTip(self.progress, "Shows the progress of the current operation")
 
     def create_file_selection(self, parent):
-        ttk.Label(parent, text="Select Python or Jupyter file:").pack(anchor="w")
+        ttk.Label(parent, text="Select Python or Jupyter file, or a project folder:").pack(anchor="w")
         file_frame = tk.Frame(parent, bg="#2e2e2e")
         file_frame.pack(fill=tk.X, pady=5)
         entry = ttk.Entry(file_frame, textvariable=self.file_path, width=50)
         entry.pack(side=tk.LEFT, padx=(0, 5))
         browse_btn = ttk.Button(file_frame, text="Browse", command=self.browse_file)
         browse_btn.pack(side=tk.LEFT)
+        browse_dir_btn = ttk.Button(file_frame, text="Browse Folder", command=self.browse_directory)
+        browse_dir_btn.pack(side=tk.LEFT, padx=(5, 0))
+        self.buttons.extend([browse_btn, browse_dir_btn])
         
-        ToolTip(entry, "Enter the path to your Python or Jupyter file")
+        ToolTip(entry, "Enter the path to your Python or Jupyter file, or a project folder")
         ToolTip(browse_btn, "Browse for a Python or Jupyter file")
+        ToolTip(browse_dir_btn, "Browse for a project folder to scan every Python and Jupyter file in it")
 
     def create_output_type_selection(self, parent):
         ttk.Label(parent, text="Output Type:").pack(anchor="w", pady=(10, 0))
@@ -343,15 +658,35 @@ class EnvBuilder:
     def create_generate_button(self, parent):
         gen_btn = ttk.Button(parent, text="Generate Environment File", command=self.generate_env_file)
         gen_btn.pack(side=tk.LEFT, padx=5)
+        self.buttons.append(gen_btn)
         ToolTip(gen_btn, "Extract dependencies from the selected file")
 
+    def create_watch_button(self, parent):
+        self.watch_btn = ttk.Button(parent, text="Watch", command=self.toggle_watch)
+        self.watch_btn.pack(side=tk.LEFT, padx=5)
+        self.buttons.append(self.watch_btn)
+        ToolTip(self.watch_btn, "Keep the output up to date as files in the project are saved")
+
     def create_save_button(self, parent):
         save_btn = ttk.Button(parent, text="Save Environment File", command=self.save_env_file)
         save_btn.pack(side=tk.LEFT, padx=5)
+        self.buttons.append(save_btn)
         ToolTip(save_btn, "Save the generated environment file")
 
     def create_venv_button(self, parent):
-        ttk.Button(parent, text="Create Virtual Environment", command=self.create_virtual_environment).pack(side=tk.LEFT, padx=5)
+        venv_btn = ttk.Button(parent, text="Create Virtual Environment", command=self.create_virtual_environment)
+        venv_btn.pack(side=tk.LEFT, padx=5)
+        self.buttons.append(venv_btn)
+
+    def create_cancel_button(self, parent):
+        self.cancel_btn = ttk.Button(parent, text="Cancel", command=self.cancel_install, state='disabled')
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        ToolTip(self.cancel_btn, "Stop the running installation and remove the partial environment")
+
+    def cancel_install(self):
+        if self.cancel_event is not None and not self.cancel_event.is_set():
+            self.cancel_event.set()
+            self.update_output("Cancelling...\n")
 
     def create_virtual_environment(self):
         if not hasattr(self, 'content') or not self.content:
@@ -363,49 +698,43 @@ class EnvBuilder:
             messagebox.showwarning("No Name", "Please enter a name for the virtual environment.")
             return
 
-        temp_req_file = os.path.join(os.path.dirname(sys.executable), "temp_requirements.txt")
-        with open(temp_req_file, "w", encoding="utf-8") as f:
+        # A private file per run, so two runs (or a batch) never share one.
+        fd, temp_req_file = tempfile.mkstemp(prefix="envbuilder-", suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
             f.write(self.content)
 
         self.progress['value'] = 0
         self.root.update_idletasks()
         
         self.disable_buttons()
+        self.cancel_event = threading.Event()
+        self.cancel_btn.configure(state='normal')
         
         thread = threading.Thread(target=self._create_venv_thread, args=(venv_name, temp_req_file))
         thread.daemon = True
         thread.start()
-        
-        self._monitor_progress(thread)
     
     def _create_venv_thread(self, venv_name, temp_req_file):
+        recorder = instrument.Recorder("Create virtual environment", profile=self.profile_runs).start()
         try:
             self.update_output(f"\nCreating virtual environment '{venv_name}'... (This may take a bit)\n")
             
-            self.thread_progress = 10
-            
-            subprocess.run([sys.executable, "-m", "venv", venv_name], check=True)
+            self._set_thread_progress(10)
             
-            self.thread_progress = 40
+            created = builder.build_environment(
+                os.path.join(os.getcwd(), venv_name), temp_req_file,
+                interpreter=self.resolver.interpreter,
+                templates=self.templates,
+                use_wheelhouse=self.use_wheelhouse,
+                use_shared_store=self.use_shared_store,
+                log=self.update_output,
+                progress=self._set_thread_progress,
+                cancel=self.cancel_event,
+            )
             
-            if os.name == 'nt':
-                pip_path = os.path.join(os.getcwd(), venv_name, "Scripts", "pip.exe")
-            else:
-                pip_path = os.path.join(os.getcwd(), venv_name, "bin", "pip")
-            
-            self.update_output("Installing dependencies...\n")
-            self.thread_progress = 60
-            
-            result = subprocess.run([pip_path, "install", "-r", temp_req_file], 
-                                   capture_output=True, text=True)
-            
-            self.thread_progress = 100
-            
-            if result.returncode == 0:
+            if created:
                 self.update_output("Virtual environment created successfully!\n")
                 self.update_output(f"Activate with: {venv_name}\\Scripts\\activate (Windows) or source {venv_name}/bin/activate (Unix/Linux/Mac)\n")
-            else:
-                self.update_output(f"Error installing dependencies:\n{result.stderr}\n")
                 
         except Exception as e:
             self.update_output(f"Error creating virtual environment: {str(e)}\n")
@@ -413,159 +742,380 @@ class EnvBuilder:
             if os.path.exists(temp_req_file):
                 os.remove(temp_req_file)
             
-            self.thread_done = True
+            recorder.stop()
+            self.call_in_ui(lambda: self._set_timings(recorder))
+            self.ui_queue.put(("done", None))
+
+    def _set_thread_progress(self, value):
+        self.ui_queue.put(("progress", value))
     
-    def _monitor_progress(self, thread):
-        if not hasattr(self, 'thread_progress'):
-            self.thread_progress = 0
-        if not hasattr(self, 'thread_done'):
-            self.thread_done = False
-        
-        self.progress['value'] = self.thread_progress
-        self.root.update_idletasks()
-        
-        if thread.is_alive() and not self.thread_done:
-            self.root.after(100, lambda: self._monitor_progress(thread))
-        else:
-            if self.thread_done:
-                self.progress['value'] = 100
-                self.root.update_idletasks()
-                self.root.after(500, lambda: self._reset_after_completion())
+    def call_in_ui(self, callback):
+        self.ui_queue.put(("call", callback))
+    
+    def _drain_ui_queue(self):
+        # Worker threads only ever put messages on ui_queue. Once per frame
+        # the Tk thread takes as many as fit in its time budget, joins the
+        # output into a single insert and applies only the last progress
+        # value, so a flood of log lines cannot starve the event loop.
+        deadline = time.perf_counter() + UI_BATCH_SECONDS
+        chunks = []
+        progress = None
+        try:
+            while time.perf_counter() < deadline:
+                kind, value = self.ui_queue.get_nowait()
+                if kind == "output":
+                    chunks.append(value)
+                elif kind == "progress":
+                    progress = value
+                else:
+                    self._flush_output(chunks)
+                    chunks = []
+                    if kind == "call":
+                        value()
+                    elif kind == "done":
+                        progress = None
+                        self._finish_job()
+        except queue.Empty:
+            pass
+        finally:
+            self._flush_output(chunks)
+            if progress is not None:
+                self.progress['value'] = progress
+            self.root.after(UI_FRAME_MS, self._drain_ui_queue)
+    
+    def _flush_output(self, chunks):
+        if not chunks:
+            return
+        self.output_text.insert(tk.END, "".join(chunks))
+        lines = int(self.output_text.index('end-1c').split('.')[0])
+        if lines > MAX_OUTPUT_LINES:
+            self.output_text.delete('1.0', f'{lines - MAX_OUTPUT_LINES + 1}.0')
+        self.output_text.see(tk.END)
+    
+    def _finish_job(self):
+        self.progress['value'] = 100
+        self.root.after(500, self._reset_after_completion)
     
     def _reset_after_completion(self):
         self.progress['value'] = 0
         self.enable_buttons()
-        self.thread_done = False
-            
-        if hasattr(self, 'thread_done') and self.thread_done:
-            self.progress['value'] = 0
-            self.enable_buttons()
+        self.cancel_btn.configure(state='disabled')
+        self.cancel_event = None
     
     def update_output(self, text):
-        self.root.after(0, lambda: self.output_text.insert(tk.END, text))
+        self.ui_queue.put(("output", text))
     
     def disable_buttons(self):
-        self._set_button_state(self.root, 'disabled')
+        self._set_button_state('disabled')
     
     def enable_buttons(self):
-        self._set_button_state(self.root, 'normal')
+        self._set_button_state('normal')
     
-    def _set_button_state(self, parent, state):
-        for child in parent.winfo_children():
-            if isinstance(child, ttk.Button):
-                child.configure(state=state)
-            if child.winfo_children():
-                self._set_button_state(child, state)
+    def _set_button_state(self, state):
+        for button in self.buttons:
+            button.configure(state=state)
 
     def browse_file(self):
-        filetypes = [("Python & Jupyter Files", "*.py *.ipynb")]
+        filetypes = [("Python & Jupyter Files", "*.py *.ipynb"),
+                     ("Archives", "*.zip *.whl *.egg *.tar *.tar.gz *.tgz *.tar.bz2 *.tar.xz")]
         filename = filedialog.askopenfilename(title="Select File", filetypes=filetypes)
         if filename:
             self.file_path.set(filename)
 
+    def browse_directory(self):
+        directory = filedialog.askdirectory(title="Select Project Folder")
+        if directory:
+            self.file_path.set(directory)
+
     def extract_imports(self, filepath):
-        imports = set()
+        # A single file is treated as an entry point: local modules and
+        # packages it imports are followed for their own dependencies.
         try:
-            if filepath.endswith(".py"):
-                with open(filepath, "r", encoding="utf-8") as f:
-                    tree = ast.parse(f.read())
-                    for node in ast.walk(tree):
-                        if isinstance(node, ast.Import):
-                            for alias in node.names:
-                                imports.add(alias.name.split('.')[0])
-                        elif isinstance(node, ast.ImportFrom):
-                            if node.module:
-                                module_name = node.module.split('.')[0]
-                                if os.path.isfile(os.path.join(os.path.dirname(filepath), module_name + ".py")):
-                                    imports.add(f"{module_name} (local file)")
-                                else:
-                                    imports.add(module_name)
-
-            elif filepath.endswith(".ipynb"):
-                nb = nbformat.read(filepath, as_version=4)
-                for cell in nb.cells:
-                    if cell.cell_type == 'code':
-                        try:
-                            tree = ast.parse(cell.source)
-                            for node in ast.walk(tree):
-                                if isinstance(node, ast.Import):
-                                    for alias in node.names:
-                                        imports.add(alias.name.split('.')[0])
-                                elif isinstance(node, ast.ImportFrom):
-                                    if node.module:
-                                        module_name = node.module.split('.')[0]
-                                        if os.path.isfile(os.path.join(os.path.dirname(filepath), module_name + ".py")):
-                                            imports.add(f"{module_name} (local file)")
-                                        else:
-                                            imports.add(module_name)
-                        except Exception:
-                            continue
+            imports, errors = modgraph.scan_entry(filepath)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to parse file: {e}")
+            imports, errors = set(), [(filepath, str(e))]
+
+        if errors:
+            path, error = errors[0]
+            message = f"Failed to parse {os.path.basename(path)}: {error}"
+            self.call_in_ui(lambda: messagebox.showerror("Error", message))
 
         return sorted(imports)
 
     def get_versions(self, modules):
-        result = []
-        
-        for mod in modules:
-            try:
-                package_name = self.import_to_package.get(mod, mod)
-                if mod in self.standard_libs or package_name in self.standard_libs:
-                    result.append((mod, "standard library"))
-                else:
-                    version = importlib.metadata.version(package_name)
-                    result.append((mod, version))
-            except importlib.metadata.PackageNotFoundError:
-                result.append((mod, None))
-        return result
+        with instrument.phase("resolve"):
+            return self.resolver.versions(modules)
 
-    def generate_env_file(self):
+    def _selected_path(self):
         filepath = self.file_path.get()
         if not filepath:
             messagebox.showwarning("No File", "Please select a file first.")
-            return
+            return None
         if not os.path.exists(filepath):
             messagebox.showwarning("File Not Found", f"The file {filepath} does not exist.")
+            return None
+        return filepath
+
+    def generate_env_file(self):
+        self.stop_watching()
+        filepath = self._selected_path()
+        if not filepath:
+            return
+
+        if self.use_daemon:
+            self.scan_with_daemon(filepath)
             return
 
-        modules = self.extract_imports(filepath)
-        versions = self.get_versions(modules)
+        self._scan_locally(filepath)
 
+    def scan_with_daemon(self, filepath):
         self.output_text.delete(1.0, tk.END)
-        self.content = ""  
-
-        if self.output_type.get() == "pip":
-            for mod, ver in versions:
-                if ver == "standard library":
-                    line = f"{mod}  # standard library" if self.include_comments else mod
-                elif "(local file)" in mod:
-                    line = f"{mod}  # local file" if self.include_comments else mod
-                else:
-                    line = f"{mod}=={ver}" if ver else f"{mod}  # not installed" if self.include_comments else mod
-                self.output_text.insert(tk.END, line + "\n")
-                
-                if ver != "standard library" and "(local file)" not in mod:
-                    package_name = self.import_to_package.get(mod, mod)
-                    self.content += f"{package_name}=={ver}\n" if ver else f"{package_name}  # not installed\n"
+        self.disable_buttons()
+        options = (self.output_type.get(), self.include_comments.get())
+        thread = threading.Thread(target=self._daemon_scan_thread, args=(filepath, options))
+        thread.daemon = True
+        thread.start()
+
+    def _daemon_scan_thread(self, filepath, options):
+        try:
+            reply = daemon.request("/scan", {"path": os.path.abspath(filepath)})
+        except daemon.DaemonError as e:
+            # Not running, or stopped since: scan here as usual.
+            self.update_output(f"Daemon unavailable ({e}); scanning locally.\n")
+            # The buttons stay disabled: the local scan posts "done" itself.
+            self.call_in_ui(lambda: self._scan_locally(filepath))
+            return
+
+        try:
+            for path, error in reply["errors"]:
+                self.update_output(f"Skipped {path}: {error}\n")
+            display, content = self.build_env_content(reply["imports"], *options)
+            display.append("")
+            display.append(f"Scanned by the daemon: {reply['rescanned']} files parsed in {reply['seconds'] * 1000:.0f} ms")
+            self.call_in_ui(lambda: self.show_env_content(display, content))
+        except probe.ProbeError as e:
+            message = str(e)
+            self.call_in_ui(lambda: messagebox.showerror("Interpreter Error", message))
+        finally:
+            self.ui_queue.put(("done", None))
+
+    def _scan_locally(self, filepath):
+        if os.path.isdir(filepath) or scanner.is_archive(filepath):
+            self.scan_directory(filepath)
         else:
-            self.output_text.insert(tk.END, "name: env\nchannels:\n  - conda-forge\ndependencies:\n")  
-            
-            self.content = "name: env\nchannels:\n  - conda-forge\ndependencies:\n"  
-            
-            for mod, ver in versions:
-                if ver == "standard library":
-                    line = f"  - {mod}  # standard library" if self.include_comments else f"  - {mod}"
-                elif "(local file)" in mod:
-                    line = f"  - {mod}  # local file" if self.include_comments else f"  - {mod}"
-                else:
-                    line = f"  - {mod}={ver}" if ver else f"  - {mod}  # not installed" if self.include_comments else f"  - {mod}"
-                self.output_text.insert(tk.END, line + "\n")
-                
-                
-                if ver != "standard library" and "(local file)" not in mod:
-                    package_name = self.import_to_package.get(mod, mod)
-                    self.content += f"  - {package_name}={ver}\n" if ver else f"  - {package_name}  # not installed\n"
+            self.scan_entry_file(filepath)
+
+    def scan_entry_file(self, filepath):
+        self.output_text.delete(1.0, tk.END)
+        self.progress['value'] = 0
+        self.disable_buttons()
+
+        options = (self.output_type.get(), self.include_comments.get())
+        thread = threading.Thread(target=self._scan_entry_thread, args=(filepath, options))
+        thread.daemon = True
+        thread.start()
+
+    def _scan_entry_thread(self, filepath, options):
+        recorder = instrument.Recorder("Generate environment file", profile=self.profile_runs).start()
+        try:
+            modules = self.extract_imports(filepath)
+            try:
+                display, content = self.build_env_content(modules, *options)
+            except probe.ProbeError as e:
+                message = str(e)
+                self.call_in_ui(lambda: messagebox.showerror("Interpreter Error", message))
+            else:
+                self.call_in_ui(lambda: self.show_env_content(display, content))
+        except Exception as e:
+            self.update_output(f"Error scanning file: {str(e)}\n")
+        finally:
+            recorder.stop()
+            self.call_in_ui(lambda: self._set_timings(recorder))
+            self.ui_queue.put(("done", None))
+
+    def scan_directory(self, directory):
+        self.output_text.delete(1.0, tk.END)
+        self.progress['value'] = 0
+        self.disable_buttons()
+
+        # Tk variables are read here, on the Tk thread, not in the worker.
+        options = (self.output_type.get(), self.include_comments.get())
+        thread = threading.Thread(target=self._scan_directory_thread, args=(directory, options))
+        thread.daemon = True
+        thread.start()
+
+    def _scan_directory_thread(self, directory, options):
+        recorder = instrument.Recorder("Generate environment file", profile=self.profile_runs).start()
+        modules = set()
+        import_cache = scanner.open_cache()
+        try:
+            if scanner.is_archive(directory):
+                # Members are read straight from the archive; their number
+                # is only known at the end.
+                paths = None
+                results = scanner.scan_path(directory, import_cache=import_cache)
+                self.update_output(f"Scanning {directory} without extracting it...\n")
+            else:
+                with instrument.phase("list files"):
+                    paths = list(scanner.iter_source_files(directory))
+                results = scanner.scan_files(paths, import_cache=import_cache, timed=True)
+                self.update_output(f"Scanning {len(paths)} files in {directory}...\n")
+
+            for done, result in enumerate(results, 1):
+                if result.timings:
+                    recorder.add_timings(result.path, result.timings)
+                if result.error:
+                    self.update_output(f"Skipped {os.path.relpath(result.path, directory)}: {result.error}\n")
+                found = result.imports - modules
+                if found:
+                    modules |= found
+                    self.update_output(f"Found {', '.join(sorted(found))} in {os.path.relpath(result.path, directory)}\n")
+                if paths:
+                    self._set_thread_progress(done * 100 // len(paths))
+
+            if import_cache and paths is not None:
+                self.update_output(f"{import_cache.hits} of {len(paths)} files unchanged since the last scan\n")
+            try:
+                display, content = self.build_env_content(sorted(modules), *options)
+            except probe.ProbeError as e:
+                message = str(e)
+                self.call_in_ui(lambda: messagebox.showerror("Interpreter Error", message))
+            else:
+                self.call_in_ui(lambda: self.show_env_content(display, content))
+        except Exception as e:
+            self.update_output(f"Error scanning directory: {str(e)}\n")
+        finally:
+            if import_cache:
+                import_cache.close()
+            recorder.stop()
+            self.call_in_ui(lambda: self._set_timings(recorder))
+            self.ui_queue.put(("done", None))
+
+    def toggle_watch(self):
+        if self.watch_stop is not None:
+            self.stop_watching()
+            return
+        filepath = self._selected_path()
+        if not filepath:
+            return
+
+        self.output_text.delete(1.0, tk.END)
+        self.watch_stop = threading.Event()
+        self.watch_btn.configure(text="Stop Watching")
+        options = (self.output_type.get(), self.include_comments.get())
+        thread = threading.Thread(target=self._watch_thread, args=(filepath, options, self.watch_stop))
+        thread.daemon = True
+        thread.start()
+
+    def stop_watching(self):
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_stop = None
+            self.watch_btn.configure(text="Watch")
+
+    def _watch_thread(self, filepath, options, stop):
+        import_cache = scanner.open_cache()
+        project = watcher.ProjectImports(filepath, import_cache)
+
+        def on_update(update):
+            try:
+                display, content = self.build_env_content(update.imports, *options)
+            except probe.ProbeError as e:
+                self.update_output(f"Interpreter error: {e}\n")
+                return
+            base = project.path if project.is_dir else os.path.dirname(project.path)
+            for path, error in update.errors:
+                display.append(f"Skipped {os.path.relpath(path, base)}: {error}")
+            changes = [f"+{mod}" for mod in update.added] + [f"-{mod}" for mod in update.removed]
+            display.append("")
+            display.append(f"Watching; updated at {time.strftime('%H:%M:%S')}, {update.rescanned} files scanned "
+                           f"in {update.seconds * 1000:.0f} ms" + (f" ({', '.join(changes)})" if changes else ""))
+
+            def show():
+                # An update that finished after Stop Watching is dropped.
+                if self.watch_stop is stop:
+                    self.show_env_content(display, content)
+            self.call_in_ui(show)
+
+        try:
+            watcher.watch(project, on_update, stop, log=self.update_output)
+        except Exception as e:
+            self.update_output(f"Stopped watching: {e}\n")
+            self.call_in_ui(lambda: self.watch_stop is stop and self.stop_watching())
+        finally:
+            if import_cache:
+                import_cache.close()
+
+    def build_env_content(self, modules, output_type, include_comments):
+        # Safe to call from a worker thread: touches no Tk state.
+        self.last_modules = modules
+        with instrument.phase("probe"):
+            target = self.resolver.target()
+        with instrument.phase("resolve"):
+            versions = self.resolver.versions(modules, target)
+
+        with instrument.phase("render"):
+            display = render.display_lines(versions, output_type, include_comments)
+            if not self.lock_closure:
+                content = render.environment_file(
+                    versions, lambda mod: self.resolver.package_name(mod, target), output_type)
+                return display, content
+
+        with instrument.phase("lock"):
+            names = [self.resolver.package_name(mod, target) for mod, ver in versions
+                     if render.is_external(mod, ver)]
+            lock = lockfile.lock(target, names)
+        with instrument.phase("render"):
+            content = render.locked_file(lock, output_type)
+        display.append("")
+        display.append(f"Pinned {len(lock.pins)} distributions for Python {target.version_string}")
+        for requirement, required_by in lock.missing:
+            display.append(f"Not installed: {requirement}" + (f" (required by {required_by})" if required_by else ""))
+        for name, version, requirement, required_by in lock.conflicts:
+            display.append(f"Conflict: {name} {version} does not satisfy {requirement} from {required_by}")
+        return display, content
+
+    def show_env_content(self, display, content):
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, "".join(line + "\n" for line in display))
+        self.content = content
+
+    def _set_timings(self, recorder):
+        self.last_timings = recorder
+        phases = sorted(recorder.phases().items(), key=lambda item: item[1]["seconds"], reverse=True)
+        top = ", ".join(f"{name} {entry['seconds']:.2f}s" for name, entry in phases[:3])
+        self.update_output(f"\n{recorder.label} took {recorder.seconds:.2f}s" + (f" ({top})" if top else "") + "\n")
+
+    def show_timings_dialog(self):
+        if self.last_timings is None:
+            messagebox.showinfo("Timings", "Generate an environment file or create a virtual environment first.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Timings")
+        dialog.geometry("760x520")
+        dialog.configure(bg="#2e2e2e")
+
+        text = tk.Text(dialog, bg="#3e3e3e", fg="#ffffff", font=("Consolas", 10), wrap=tk.NONE)
+        text.insert(tk.END, self.last_timings.summary())
+        text.configure(state='disabled')
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        button_frame = tk.Frame(dialog, bg="#2e2e2e")
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="Close", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        export_btn = ttk.Button(button_frame, text="Export JSON...", command=self.export_timings)
+        export_btn.pack(side=tk.RIGHT, padx=5)
+        ToolTip(export_btn, "Save the per-phase and per-file timings as JSON")
+
+        dialog.transient(self.root)
+
+    def export_timings(self):
+        save_path = filedialog.asksaveasfilename(defaultextension=".json",
+                                                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if save_path:
+            self.last_timings.write_json(save_path)
+            messagebox.showinfo("Timings Saved", f"Timings saved to {save_path}")
 
     def save_env_file(self):
         if not hasattr(self, 'content') or not self.content:
@@ -0,0 +1,97 @@
+import ast
+import re
+
+# Only strings, comments and the import keywords are matched; everything
+# else is skipped inside the regex engine. Whether a keyword starts a
+# statement is decided by looking back along its physical line.
+_TOKEN = re.compile(r"""
+    (?P<string>
+        '''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''
+      | \"\"\"[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*\"\"\"
+      | '[^'\\\r\n]*(?:\\.[^'\\\r\n]*)*'
+      | "[^"\\\r\n]*(?:\\.[^"\\\r\n]*)*"
+    )
+  | (?P<unterminated>'''|\"\"\"|['"])
+  | (?P<comment>\#[^\r\n]*)
+  | (?P<keyword>\b(?:import|from)\b)
+""", re.VERBOSE | re.DOTALL)
+
+_STATEMENT_STOP = re.compile(r"[\r\n;#(\\]")
+
+
+class Ambiguous(Exception):
+    pass
+
+
+def _line_start(source, pos):
+    return max(source.rfind("\n", 0, pos), source.rfind("\r", 0, pos)) + 1
+
+
+def _starts_statement(source, pos):
+    start = _line_start(source, pos)
+    prefix = source[start:pos].strip(" \t\f\ufeff")
+    if prefix:
+        # `if TYPE_CHECKING: import x`, `a = 1; import x`
+        return prefix[-1] in ":;"
+    # A backslash-continued previous line means this is the tail of another
+    # statement, e.g. `raise Error \` followed by `from exc`.
+    end = start
+    if end and source[end - 1] == "\n":
+        end -= 1
+    if end and source[end - 1] == "\r":
+        end -= 1
+    return end == 0 or source[end - 1] != "\\"
+
+
+def _statement_end(source, pos):
+    while True:
+        m = _STATEMENT_STOP.search(source, pos)
+        if m is None:
+            return len(source)
+        char = m.group()
+        if char == "(":
+            close = source.find(")", m.end())
+            if close == -1:
+                raise Ambiguous("unclosed import parenthesis")
+            pos = close + 1
+        elif char == "\\":
+            pos = m.end() + 1
+            if source.startswith("\r\n", m.end()):
+                pos += 1
+        else:
+            return m.start()
+
+
+def _parse_statement(snippet):
+    try:
+        body = ast.parse(snippet).body
+    except SyntaxError:
+        raise Ambiguous(snippet)
+    if len(body) != 1 or not isinstance(body[0], (ast.Import, ast.ImportFrom)):
+        raise Ambiguous(snippet)
+    return body[0]
+
+
+def import_nodes(source):
+    # Returns the Import/ImportFrom nodes of every import statement at any
+    # nesting depth, or raises Ambiguous when the lexer cannot be sure of the
+    # statement structure (unterminated strings, an import keyword in an
+    # unexpected place, a statement that does not parse on its own).
+    nodes = []
+    statement_end = 0
+
+    for m in _TOKEN.finditer(source):
+        kind = m.lastgroup
+        if kind == "keyword":
+            if m.start() < statement_end:
+                continue
+            if _starts_statement(source, m.start()):
+                statement_end = _statement_end(source, m.end())
+                nodes.append(_parse_statement(source[m.start():statement_end]))
+            elif m.group() == "import":
+                raise Ambiguous("import keyword outside an import statement")
+            # any other `from` belongs to `yield from` or `raise ... from`
+        elif kind == "unterminated":
+            raise Ambiguous("unterminated string")
+
+    return nodes
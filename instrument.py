@@ -0,0 +1,150 @@
+import io
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Phases are recorded into whichever Recorder the current thread started.
+# Threads without one, such as batch jobs or a second GUI worker, record
+# nothing and cannot interleave their phases into another thread's run.
+# When none is active, phase() costs one attribute lookup, so instrumented
+# code paths stay in place permanently.
+_state = threading.local()
+
+
+class Recorder:
+    def __init__(self, label, profile=False):
+        self.label = label
+        self.records = []
+        self.started = time.time()
+        self.seconds = None
+        self.profile = None
+        self._profiler = None
+        self._want_profile = profile
+        self._lock = threading.Lock()
+        self._clock = None
+
+    def start(self):
+        _state.recorder = self
+        self._clock = time.perf_counter()
+        if self._want_profile:
+            import cProfile
+
+            # cProfile only sees the thread that enables it, so start()
+            # belongs in the thread that does the work.
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile = self._profile_text()
+            self._profiler = None
+        self.seconds = time.perf_counter() - self._clock
+        if getattr(_state, "recorder", None) is self:
+            _state.recorder = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add(self, phase, seconds, path=None, blocks=None):
+        with self._lock:
+            self.records.append({"phase": phase, "path": path, "seconds": seconds, "blocks": blocks})
+
+    def add_timings(self, path, timings):
+        # Timings measured elsewhere, e.g. in a scanner worker process.
+        for phase, (seconds, blocks) in timings.items():
+            self.add(phase, seconds, path, blocks)
+
+    def phases(self):
+        totals = {}
+        for record in self.records:
+            entry = totals.setdefault(record["phase"], {"calls": 0, "seconds": 0.0, "blocks": 0})
+            entry["calls"] += 1
+            entry["seconds"] += record["seconds"]
+            entry["blocks"] += record["blocks"] or 0
+        return totals
+
+    def files(self, limit=20):
+        per_file = {}
+        for record in self.records:
+            if record["path"]:
+                per_file[record["path"]] = per_file.get(record["path"], 0.0) + record["seconds"]
+        return sorted(per_file.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def _profile_text(self, limit=30):
+        import pstats
+
+        stream = io.StringIO()
+        pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        return stream.getvalue()
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "started": self.started,
+            "seconds": self.seconds,
+            "python": sys.version.split()[0],
+            "phases": self.phases(),
+            "records": self.records,
+            "profile": self.profile,
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        lines = [f"{self.label}: {self.seconds or 0:.3f}s total"]
+        lines.append(f"{'phase':<16} {'calls':>7} {'seconds':>10} {'net blocks':>12}")
+        for phase, entry in sorted(self.phases().items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append(f"{phase:<16} {entry['calls']:>7} {entry['seconds']:>10.4f} {entry['blocks']:>12}")
+        slow = self.files(10)
+        if slow:
+            lines.append("")
+            lines.append("Slowest files:")
+            lines.extend(f"  {seconds:.4f}s  {path}" for path, seconds in slow)
+        if self.profile:
+            lines.append("")
+            lines.append(self.profile)
+        return "\n".join(lines)
+
+
+def active():
+    return getattr(_state, "recorder", None)
+
+
+@contextmanager
+def phase(name, path=None):
+    recorder = getattr(_state, "recorder", None)
+    if recorder is None:
+        yield
+        return
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - start, path, sys.getallocatedblocks() - blocks)
+
+
+@contextmanager
+def measure(timings, name):
+    # Same measurement into a plain dict, for code running in a worker
+    # process that has no Recorder.
+    if timings is None:
+        yield
+        return
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds, total = timings.get(name, (0.0, 0))
+        timings[name] = (seconds + time.perf_counter() - start, total + sys.getallocatedblocks() - blocks)
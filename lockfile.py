@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+import distindex
+
+LockResult = namedtuple("LockResult", ["pins", "missing", "conflicts"])
+
+
+def packaging_modules():
+    # packaging is optional: pip vendors a copy, and every interpreter
+    # EnvBuilder can create a venv with has pip.
+    try:
+        from packaging import markers, requirements
+    except ImportError:
+        from pip._vendor.packaging import markers, requirements
+    return markers, requirements
+
+
+class DependencyClosure:
+    # Walks Requires-Dist over an installed distribution index. Every
+    # (distribution, extra) pair is expanded once, however many paths reach
+    # it, so the walk is linear in the size of the environment. Parsing is
+    # the expensive part, so each distinct marker is parsed and evaluated
+    # once, and a requirement is only parsed in full once its marker
+    # applies; most Requires-Dist lines are for extras nobody asked for.
+    def __init__(self, index, markers):
+        self.index = index
+        self.markers = dict(markers)
+        self._markers_module, self._requirements_module = packaging_modules()
+        self._split = {}
+        self._parsed = {}
+        self._evaluated = {}
+
+    def _requirements(self, key):
+        if key not in self._split:
+            self._split[key] = [(text, text.partition(";")[2].strip() or None)
+                                for text in self.index.requirements.get(key, [])]
+        return self._split[key]
+
+    def _evaluate(self, marker, extra):
+        memo_key = (marker, extra)
+        if memo_key not in self._evaluated:
+            try:
+                parsed = self._markers_module.Marker(marker)
+                result = parsed.evaluate(dict(self.markers, extra=extra))
+            except (self._markers_module.InvalidMarker, self._markers_module.UndefinedComparison,
+                    self._markers_module.UndefinedEnvironmentName):
+                result = False
+            self._evaluated[memo_key] = result
+        return self._evaluated[memo_key]
+
+    def _applies(self, marker, extra):
+        if marker is None:
+            return not extra
+        # Requirements that apply without the extra were already followed
+        # when the distribution itself was expanded.
+        return self._evaluate(marker, extra) and not (extra and self._evaluate(marker, ""))
+
+    def _parse(self, text):
+        if text not in self._parsed:
+            try:
+                self._parsed[text] = self._requirements_module.Requirement(text)
+            except self._requirements_module.InvalidRequirement:
+                self._parsed[text] = None
+        return self._parsed[text]
+
+    def resolve(self, names):
+        pins = {}
+        missing = {}
+        conflicts = []
+        expanded = set()
+        pending = [(name, None, None) for name in names]
+        while pending:
+            name, requirement, required_by = pending.pop()
+            key = distindex.normalize_name(name)
+            found = self.index.distributions.get(key)
+            if found is None:
+                missing.setdefault(key, (str(requirement) if requirement else name, required_by))
+                continue
+            dist_name, version = found
+            if key not in pins:
+                pins[key] = found
+            if requirement is not None and requirement.specifier and \
+                    not requirement.specifier.contains(version, prereleases=True):
+                conflicts.append((dist_name, version, str(requirement), required_by))
+
+            extras = [""] if requirement is None else [""] + sorted(requirement.extras)
+            for active in extras:
+                if (key, active) in expanded:
+                    continue
+                expanded.add((key, active))
+                for text, marker in self._requirements(key):
+                    if self._applies(marker, active):
+                        dep = self._parse(text)
+                        if dep is not None:
+                            pending.append((dep.name, dep, dist_name))
+        return LockResult(
+            sorted(pins.values(), key=lambda pin: distindex.normalize_name(pin[0])),
+            sorted(missing.values()),
+            conflicts,
+        )
+
+
+def lock(target, names):
+    # target is a probe.InterpreterInfo; markers are evaluated for it, not
+    # for the interpreter EnvBuilder happens to run under.
+    return DependencyClosure(target.index, target.markers).resolve(names)
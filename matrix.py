@@ -0,0 +1,125 @@
+import os
+from collections import namedtuple
+
+import distindex
+import lockfile
+import probe
+import render
+import resolver
+
+NOT_INSTALLED = "not installed"
+
+# pins maps a row key to what the file says for it: a version, "standard
+# library", or None when nothing is installed. Rows are import names, or
+# distribution names in lock mode.
+Column = namedtuple("Column", ["interpreter", "target", "pins", "content", "error"])
+
+
+def probe_all(interpreters, workers=None):
+    # Each probe is a subprocess, so threads run them in parallel. Returns
+    # (InterpreterInfo or None, error or None) per interpreter, in order.
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(executable):
+        try:
+            return probe.probe_interpreter(executable), None
+        except probe.ProbeError as e:
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers or len(interpreters) or 1) as pool:
+        return list(pool.map(run, interpreters))
+
+
+def _column(deps, modules, executable, target, output_type, lock):
+    versions = deps.versions(modules, target)
+    pins = {mod: ver or None for mod, ver in versions
+            if ver == resolver.STANDARD_LIBRARY or render.is_external(mod, ver)}
+    if not lock:
+        content = render.environment_file(versions, lambda mod: deps.package_name(mod, target), output_type)
+        return Column(executable, target, pins, content, None)
+
+    names = [deps.package_name(mod, target) for mod, ver in versions if render.is_external(mod, ver)]
+    result = lockfile.lock(target, names)
+    pins = {mod: ver for mod, ver in pins.items() if ver == resolver.STANDARD_LIBRARY}
+    pins.update((distindex.normalize_name(name), version) for name, version in result.pins)
+    pins.update((distindex.normalize_name(requirement), None) for requirement, required_by in result.missing)
+    return Column(executable, target, pins, render.locked_file(result, output_type), None)
+
+
+def build(modules, interpreters, deps=None, output_type="pip", lock=False):
+    # One Column per interpreter from a single scan's module list.
+    deps = deps or resolver.Resolver(dict(resolver.COMMON_ALIASES))
+    columns = []
+    for executable, (target, error) in zip(interpreters, probe_all(interpreters)):
+        if target is None:
+            columns.append(Column(executable, None, {}, None, error))
+        else:
+            columns.append(_column(deps, modules, executable, target, output_type, lock))
+    return columns
+
+
+def divergence(columns):
+    # Rows whose pin is not the same for every interpreter that probed.
+    probed = [column for column in columns if column.error is None]
+    keys = sorted(set().union(*(column.pins for column in probed)), key=str.lower) if probed else []
+    rows = []
+    for key in keys:
+        values = [column.pins.get(key) for column in probed]
+        if len(set(values)) > 1:
+            rows.append((key, values))
+    return rows
+
+
+def _labels(columns):
+    # py3.11 etc.; the full version, then the position, tell apart
+    # interpreters that share a minor version.
+    minor = [f"py{c.target.version[0]}.{c.target.version[1]}" if c.target else "unknown" for c in columns]
+    labels = [f"py{c.target.version_string}" if c.target and minor.count(label) > 1 else label
+              for c, label in zip(columns, minor)]
+    return [f"{label}-{labels[:i].count(label) + 1}" if labels.count(label) > 1 else label
+            for i, label in enumerate(labels)]
+
+
+def file_names(columns, output_type="pip"):
+    stem, extension = ("requirements", ".txt") if output_type == "pip" else ("environment", ".yml")
+    return [f"{stem}-{label}{extension}" for label in _labels(columns)]
+
+
+def write_files(columns, directory, output_type="pip"):
+    written = []
+    for column, name in zip(columns, file_names(columns, output_type)):
+        if column.content is None:
+            continue
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(column.content)
+        written.append(path)
+    return written
+
+
+def summary(columns):
+    lines = []
+    for column in columns:
+        if column.error:
+            lines.append(f"{column.interpreter}: {column.error}")
+        else:
+            lines.append(f"Python {column.target.version_string}: {column.interpreter}")
+    probed = [column for column in columns if column.error is None]
+    rows = divergence(columns)
+    if len(probed) < 2:
+        return "\n".join(lines) + "\n"
+    if not rows:
+        lines.append("")
+        lines.append("All interpreters agree on every pin.")
+        return "\n".join(lines) + "\n"
+
+    headers = [label for column, label in zip(columns, _labels(columns)) if column.error is None]
+    cells = [[value or NOT_INSTALLED for value in values] for key, values in rows]
+    key_width = max(len("package"), *(len(key) for key, values in rows))
+    widths = [max(len(header), *(len(row[i]) for row in cells)) for i, header in enumerate(headers)]
+    lines.append("")
+    lines.append(f"{len(rows)} pins differ:")
+    lines.append("  ".join([f"{'package':<{key_width}}"] + [f"{h:<{w}}" for h, w in zip(headers, widths)]).rstrip())
+    for (key, values), row in zip(rows, cells):
+        lines.append("  ".join([f"{key:<{key_width}}"] + [f"{c:<{w}}" for c, w in zip(row, widths)]).rstrip())
+    return "\n".join(lines) + "\n"
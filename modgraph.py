@@ -0,0 +1,269 @@
+import ast
+import os
+
+import instrument
+import notebooks
+import scanner
+
+
+def _find_module(directory, name):
+    # Returns (file, is_package) for a module or regular package named
+    # name inside directory, or None.
+    path = os.path.join(directory, name)
+    init = os.path.join(path, "__init__.py")
+    if os.path.isfile(init):
+        return init, True
+    if os.path.isfile(path + ".py"):
+        return path + ".py", False
+    return None
+
+
+def project_roots(entry):
+    # The entry's own directory plays the part of sys.path[0]. When the
+    # entry lives inside a package, the directory above the outermost
+    # package is a root too, so "from app.utils import x" resolves.
+    directory = os.path.dirname(os.path.abspath(entry))
+    root = scanner.package_root(directory)
+    return [directory] if root == directory else [directory, root]
+
+
+class ModuleGraph:
+    def __init__(self, roots, fast=True):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.fast = fast
+        self.edges = {}
+        self.external = {}
+        self.local = {}
+        self.errors = {}
+        self._found = {}
+        self._closure = {}
+        self._parsed = {}
+        self.parses = 0
+
+    def _lookup(self, directory, name):
+        key = (directory, name)
+        if key not in self._found:
+            self._found[key] = _find_module(directory, name)
+        return self._found[key]
+
+    def _resolve(self, directory, parts, files):
+        # Walks a dotted name down from directory, collecting every
+        # package __init__ and module file on the way. Returns False when
+        # the first part is not a local module.
+        for i, part in enumerate(parts):
+            found = self._lookup(directory, part)
+            if found is None:
+                return i > 0
+            path, is_package = found
+            files.add(path)
+            if not is_package:
+                # Anything after a plain module is an attribute.
+                return True
+            directory = os.path.dirname(path)
+        return True
+
+    def _sources(self, path):
+        if path.endswith(".ipynb"):
+            with instrument.phase("notebook", path):
+                return notebooks.read_code_cells(path)
+        with instrument.phase("read", path):
+            with open(path, "r", encoding="utf-8") as f:
+                return [f.read()]
+
+    def _nodes(self, path):
+        if path in self._parsed:
+            return self._parsed[path]
+        nodes = []
+        sources = self._sources(path)
+        notebook = path.endswith(".ipynb")
+        with instrument.phase("parse", path):
+            for source in sources:
+                try:
+                    nodes.extend(scanner.import_nodes(source, self.fast, validate=not notebook))
+                except SyntaxError:
+                    # A bad notebook cell is skipped like scan_file does; a
+                    # bad module is reported.
+                    if len(sources) == 1 and not notebook:
+                        raise
+        self._parsed[path] = nodes
+        self.parses += 1
+        return nodes
+
+    def _visit(self, path):
+        files = set()
+        external = set()
+        local = set()
+        directory = os.path.dirname(path)
+        search = [directory] + [root for root in self.roots if root != directory]
+
+        for node in self._nodes(path):
+            if isinstance(node, ast.Import):
+                targets = [(alias.name.split("."), ()) for alias in node.names]
+                level = 0
+            elif isinstance(node, ast.ImportFrom):
+                targets = [((node.module or "").split(".") if node.module else [], [a.name for a in node.names])]
+                level = node.level or 0
+            else:
+                continue
+
+            for parts, names in targets:
+                if level:
+                    base = directory
+                    for _ in range(level - 1):
+                        base = os.path.dirname(base)
+                    bases = [base]
+                    # A relative import runs the enclosing package first.
+                    if os.path.isfile(os.path.join(base, "__init__.py")):
+                        files.add(os.path.join(base, "__init__.py"))
+                else:
+                    bases = search
+                for base in bases:
+                    if not self._resolve(base, parts, files):
+                        continue
+                    # "from pkg import mod" may name a submodule.
+                    package = os.path.join(base, *parts)
+                    if os.path.isfile(os.path.join(package, "__init__.py")):
+                        for name in names:
+                            if name != "*":
+                                self._resolve(package, [name], files)
+                    # Relative imports stay inside a package that is
+                    # already labelled by its top-level name.
+                    if parts and not level:
+                        local.add(parts[0])
+                    break
+                else:
+                    if parts and not level:
+                        external.add(parts[0])
+
+        files.discard(path)
+        self.edges[path] = files
+        self.external[path] = external
+        self.local[path] = local
+
+    def add(self, path):
+        # Parses path and every local module it reaches, each exactly once.
+        path = os.path.abspath(path)
+        pending = [path]
+        while pending:
+            current = pending.pop()
+            if current in self.edges:
+                continue
+            try:
+                self._visit(current)
+            except Exception as e:
+                self.errors[current] = f"{type(e).__name__}: {e}"
+                self.edges[current] = set()
+                self.external[current] = set()
+                self.local[current] = set()
+                continue
+            pending.extend(target for target in self.edges[current] if target not in self.edges)
+        return path
+
+    def _forget(self, path):
+        for table in (self.edges, self.external, self.local, self.errors):
+            table.pop(path, None)
+
+    def invalidate(self, paths):
+        # Forgets paths that changed on disk so the next dependencies() call
+        # re-reads them. A file that vanished, or one the graph has not seen
+        # and so may be new, can change how any import resolves; then every
+        # module is resolved again from its cached parse, without re-reading
+        # unchanged files.
+        structural = False
+        for path in map(os.path.abspath, paths):
+            prefix = path + os.sep
+            for known in [p for p in self._parsed if p == path or p.startswith(prefix)]:
+                del self._parsed[known]
+            if not os.path.isfile(path) or path not in self.edges:
+                structural = True
+            self._forget(path)
+        if structural:
+            self._found.clear()
+            for path in list(self.edges):
+                self._forget(path)
+        self._closure.clear()
+
+    def reachable(self, path):
+        path = os.path.abspath(path)
+        seen = {path}
+        pending = [path]
+        while pending:
+            for target in self.edges.get(pending.pop(), ()):
+                if target not in seen:
+                    seen.add(target)
+                    pending.append(target)
+        return seen
+
+    def dependencies(self, path):
+        # External imports reachable from path. Modules that import each
+        # other share one result: Tarjan's algorithm finds each cycle, and
+        # its union is memoized for every member.
+        path = self.add(path)
+        if path in self._closure:
+            return self._closure[path]
+
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        counter = 0
+        work = [(path, iter(sorted(self.edges[path])))]
+        index[path] = lowlink[path] = counter
+        counter += 1
+        stack.append(path)
+        on_stack.add(path)
+
+        while work:
+            node, successors = work[-1]
+            advanced = False
+            for succ in successors:
+                if succ in self._closure:
+                    continue
+                if succ not in index:
+                    index[succ] = lowlink[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(sorted(self.edges[succ]))))
+                    advanced = True
+                    break
+                if succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            if advanced:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] != index[node]:
+                continue
+
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            members = set(component)
+            result = set()
+            for member in component:
+                result |= self.external[member]
+                result.update(scanner.local_label(name) for name in self.local[member])
+                for succ in self.edges[member]:
+                    if succ not in members:
+                        result |= self._closure[succ]
+            result = frozenset(result)
+            for member in component:
+                self._closure[member] = result
+
+        return self._closure[path]
+
+
+def scan_entry(path, fast=True):
+    # Scans an entry-point script together with every local module and
+    # package it imports, directly or through other local modules.
+    graph = ModuleGraph(project_roots(path), fast)
+    imports = graph.dependencies(path)
+    return imports, sorted(graph.errors.items())
@@ -0,0 +1,224 @@
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_CONTAINER_SPECIAL = re.compile(rb'[\[\]{}"]')
+_SCALAR = re.compile(rb"[^,\]}\s]*")
+
+
+class NotebookFormatError(ValueError):
+    pass
+
+
+class _ByteStream:
+    # JSON structural characters are all ASCII and UTF-8 continuation bytes
+    # never are, so the notebook can be walked as raw bytes without decoding
+    # the values we skip.
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+
+    def fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            raise NotebookFormatError("Unexpected end of notebook JSON")
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise NotebookFormatError(f"Expected {char!r} in notebook JSON, found {found!r}")
+        self.pos += 1
+
+    def _string_end(self, i, keep):
+        # Returns the index just past the closing quote. Only bytes from
+        # self.pos onwards survive a refill, so callers that do not need the
+        # string move self.pos along with the scan (keep=False).
+        quote = -1
+        while True:
+            if quote < i:
+                quote = self.buf.find(b'"', i)
+                if quote == -1:
+                    quote = len(self.buf)
+            escape = self.buf.find(b"\\", i, quote)
+            if escape == -1:
+                if quote < len(self.buf):
+                    return quote + 1
+                i = len(self.buf)
+            elif escape + 1 < len(self.buf):
+                i = escape + 2
+                continue
+            else:
+                i = escape
+            if not keep:
+                self.pos = i
+            i -= self.pos
+            self.fill()
+            quote = -1
+
+    def read_string(self):
+        if self.peek() != b'"':
+            raise NotebookFormatError("Expected a string in notebook JSON")
+        end = self._string_end(self.pos + 1, keep=True)
+        raw = self.buf[self.pos:end]
+        self.pos = end
+        return json.loads(raw)
+
+    def skip_string(self):
+        self.pos = self._string_end(self.pos + 1, keep=False)
+
+    def read_scalar(self):
+        self.peek()
+        while True:
+            end = _SCALAR.match(self.buf, self.pos).end()
+            if end < len(self.buf):
+                break
+            self.fill()
+        raw = self.buf[self.pos:end]
+        self.pos = end
+        return json.loads(raw)
+
+    def skip_value(self):
+        char = self.peek()
+        if char == b'"':
+            self.skip_string()
+        elif char in (b"{", b"["):
+            self.pos += 1
+            depth = 1
+            while depth:
+                m = _CONTAINER_SPECIAL.search(self.buf, self.pos)
+                if m is None:
+                    self.pos = len(self.buf)
+                    self.fill()
+                    continue
+                char = m.group()
+                self.pos = m.start()
+                if char == b'"':
+                    self.skip_string()
+                    continue
+                depth += 1 if char in (b"{", b"[") else -1
+                self.pos += 1
+        else:
+            self.read_scalar()
+
+    def next_member(self, closing):
+        char = self.peek()
+        self.pos += 1
+        if char == b",":
+            return True
+        if char == closing:
+            return False
+        raise NotebookFormatError(f"Unexpected {char!r} in notebook JSON")
+
+    def read_source(self):
+        if self.peek() != b"[":
+            return self.read_string()
+        self.pos += 1
+        parts = []
+        if self.peek() == b"]":
+            self.pos += 1
+            return ""
+        while True:
+            parts.append(self.read_string())
+            if not self.next_member(b"]"):
+                return "".join(parts)
+
+
+def _iter_cells(stream):
+    stream.expect(b"[")
+    if stream.peek() == b"]":
+        stream.pos += 1
+        return
+    while True:
+        stream.expect(b"{")
+        cell_type = source = None
+        if stream.peek() == b"}":
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.read_string()
+                stream.expect(b":")
+                if key == "cell_type":
+                    cell_type = stream.read_string()
+                elif key == "source":
+                    source = stream.read_source()
+                else:
+                    # outputs, attachments and metadata are never materialized
+                    stream.skip_value()
+                if not stream.next_member(b"}"):
+                    break
+        if cell_type == "code" and source is not None:
+            yield source
+        if not stream.next_member(b"]"):
+            return
+
+
+def iter_code_cells(f, chunk_size=CHUNK_SIZE):
+    stream = _ByteStream(f, chunk_size)
+    if stream.peek() == b"\xef":
+        while len(stream.buf) - stream.pos < 3:
+            stream.fill()
+        if stream.buf.startswith(b"\xef\xbb\xbf", stream.pos):
+            stream.pos += 3
+    stream.expect(b"{")
+    if stream.peek() == b"}":
+        raise NotebookFormatError("Notebook has no cells")
+
+    found_cells = False
+    while True:
+        key = stream.read_string()
+        stream.expect(b":")
+        if key == "cells":
+            found_cells = True
+            yield from _iter_cells(stream)
+        elif key == "nbformat":
+            version = stream.read_scalar()
+            if not isinstance(version, int) or version < 4:
+                raise NotebookFormatError(f"Unsupported nbformat version {version}")
+        else:
+            stream.skip_value()
+        if not stream.next_member(b"}"):
+            break
+
+    # nbformat 3 and older keep cells under "worksheets"
+    if not found_cells:
+        raise NotebookFormatError("Notebook has no top-level cells list")
+
+
+def read_code_cells(source):
+    # source is a path or a seekable binary file object, e.g. a zip member.
+    if not hasattr(source, "read"):
+        with open(source, "rb") as f:
+            return read_code_cells(f)
+
+    start = source.tell()
+    try:
+        return list(iter_code_cells(source))
+    except (NotebookFormatError, ValueError):
+        pass
+
+    import io
+
+    import nbformat
+
+    source.seek(start)
+    text = io.TextIOWrapper(source, encoding="utf-8")
+    try:
+        nb = nbformat.read(text, as_version=4)
+    finally:
+        # Leave source open for its owner.
+        text.detach()
+    return [cell.source for cell in nb.cells if cell.cell_type == 'code']
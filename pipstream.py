@@ -0,0 +1,203 @@
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+
+_COLLECTING = re.compile(r"^Collecting ([A-Za-z0-9][A-Za-z0-9._-]*)")
+_PROCESSING = re.compile(r"^Processing \S*?([A-Za-z0-9][A-Za-z0-9._]*)-[^-/\\]+?(?:-[^/\\]*\.whl|\.tar\.gz|\.zip)(?:\s|$)")
+_DOWNLOADING = re.compile(r"^\s+(Downloading|Using cached) \S+(?: \(([^)]*)\))?")
+_SATISFIED = re.compile(r"^Requirement already satisfied: ([A-Za-z0-9][A-Za-z0-9._-]*)")
+_BUILDING = re.compile(r"^\s*Building wheel for ([A-Za-z0-9][A-Za-z0-9._-]*)")
+_INSTALLING = re.compile(r"^Installing collected packages: (.*)$")
+_INSTALLED = re.compile(r"^Successfully installed (.*)$")
+
+_STOP_TIMEOUT = 5
+
+COLLECTING = "collecting"
+DOWNLOADING = "downloading"
+CACHED = "cached"
+SATISFIED = "satisfied"
+BUILDING = "building"
+INSTALLING = "installing"
+INSTALLED = "installed"
+ERROR = "error"
+
+
+def _key(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+class PackageProgress:
+    def __init__(self, name):
+        self.name = name
+        self.state = COLLECTING
+        self.version = None
+        self.size = None
+        self.seconds = 0.0
+
+
+class InstallProgress:
+    # pip resolves and downloads one package at a time, so the time between
+    # two events is charged to whichever package the earlier event named.
+    # The final install step is a single batch and is timed as a whole.
+    def __init__(self, expected=0):
+        self.expected = expected
+        self.packages = {}
+        self.current = None
+        self.install_seconds = 0.0
+        self.installing = False
+        self.finished = False
+        self._fraction = 0.0
+        self.started = self._mark = time.monotonic()
+
+    def _charge(self, now):
+        elapsed = now - self._mark
+        if self.installing:
+            self.install_seconds += elapsed
+        elif self.current is not None:
+            self.current.seconds += elapsed
+        self._mark = now
+
+    def _package(self, name):
+        key = _key(name)
+        if key not in self.packages:
+            self.packages[key] = PackageProgress(name)
+        return self.packages[key]
+
+    def feed(self, line, now=None):
+        # Returns the package the line was about, or None.
+        self._charge(time.monotonic() if now is None else now)
+
+        m = _COLLECTING.match(line) or _PROCESSING.match(line)
+        if m:
+            self.current = self._package(m.group(1))
+            return self.current
+        m = _DOWNLOADING.match(line)
+        if m and self.current is not None:
+            self.current.state = DOWNLOADING if m.group(1) == "Downloading" else CACHED
+            self.current.size = m.group(2)
+            return self.current
+        m = _SATISFIED.match(line)
+        if m:
+            package = self._package(m.group(1))
+            package.state = SATISFIED
+            self.current = None
+            return package
+        m = _BUILDING.match(line)
+        if m:
+            self.current = self._package(m.group(1))
+            self.current.state = BUILDING
+            return self.current
+        m = _INSTALLING.match(line)
+        if m:
+            for name in m.group(1).split(","):
+                if name.strip():
+                    self._package(name.strip()).state = INSTALLING
+            self.current = None
+            self.installing = True
+            return None
+        m = _INSTALLED.match(line)
+        if m:
+            for item in m.group(1).split():
+                name, _, version = item.rpartition("-")
+                package = self._package(name or item)
+                package.state = INSTALLED
+                package.version = version or None
+            self.installing = False
+            self.finished = True
+            return None
+        if line.startswith("ERROR:") and self.current is not None:
+            self.current.state = ERROR
+            return self.current
+        return None
+
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        if self.installing:
+            return 0.9
+        total = max(self.expected, len(self.packages), 1)
+        # The package being collected right now is not done yet. Packages
+        # discovered later only ever add to the total, so never step back.
+        done = len(self.packages) - (1 if self.current is not None else 0)
+        self._fraction = max(self._fraction, 0.85 * max(0, done) / total)
+        return self._fraction
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def slowest(self, count=5):
+        ranked = sorted(self.packages.values(), key=lambda package: package.seconds, reverse=True)
+        return [package for package in ranked[:count] if package.seconds >= 0.05]
+
+
+class PipResult:
+    def __init__(self, args, returncode, stdout, stderr, progress, cancelled):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.progress = progress
+        self.cancelled = cancelled
+
+
+def _pump(stream, name, lines):
+    try:
+        for line in iter(stream.readline, ""):
+            lines.put((name, line))
+    finally:
+        stream.close()
+        lines.put((name, None))
+
+
+def run_pip(python, args, env=None, expected=0, on_line=None, cancel=None, poll_interval=0.1):
+    # Streams pip's stdout and stderr line by line. Reader threads push lines
+    # into one queue; the calling thread parses them, reports them through
+    # on_line(stream, line, package, progress) and terminates pip as soon as
+    # the cancel event is set.
+    command = [python, "-m", "pip"] + list(args)
+    env = dict(os.environ, PYTHONUNBUFFERED="1", **(env or {}))
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               stdin=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace",
+                               bufsize=1, env=env, creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+
+    lines = queue.Queue()
+    readers = [threading.Thread(target=_pump, args=(process.stdout, "stdout", lines), daemon=True),
+               threading.Thread(target=_pump, args=(process.stderr, "stderr", lines), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    progress = InstallProgress(expected)
+    output = {"stdout": [], "stderr": []}
+    open_streams = len(readers)
+    cancelled = None
+    while open_streams:
+        if cancel is not None and cancel.is_set() and cancelled is None:
+            cancelled = time.monotonic()
+            process.terminate()
+        if cancelled is not None and time.monotonic() - cancelled > _STOP_TIMEOUT:
+            # A build backend pip spawned can keep the pipes open after pip
+            # itself has gone; stop waiting for it.
+            process.kill()
+            break
+        try:
+            name, line = lines.get(timeout=poll_interval)
+        except queue.Empty:
+            continue
+        if line is None:
+            open_streams -= 1
+            continue
+        output[name].append(line)
+        package = progress.feed(line.rstrip("\r\n"))
+        if on_line:
+            on_line(name, line, package, progress)
+
+    try:
+        returncode = process.wait(timeout=_STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        returncode = process.wait()
+    return PipResult(command, returncode, "".join(output["stdout"]), "".join(output["stderr"]),
+                     progress, cancelled is not None)
@@ -0,0 +1,227 @@
+import csv
+import email.parser
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import time
+import uuid
+
+import cache
+import distindex
+import venvs
+
+_PINNED = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?==([^\s;,]+)$")
+_SHEBANG_PYTHON = re.compile(rb"^#![^\r\n]*python[^\r\n]*(\r?\n)")
+_PYTHON_PLACEHOLDER = b"#!{python}"
+# Store objects are read-only, and so is every hardlink to them. Windows
+# cannot delete a read-only file, so pip could neither upgrade nor
+# uninstall a linked package there; venvs get writable copies instead.
+LINKS_SUPPORTED = os.name != 'nt'
+
+
+def site_packages(venv_dir, version):
+    if os.name == 'nt':
+        return os.path.join(venv_dir, "Lib", "site-packages")
+    return os.path.join(venv_dir, "lib", f"python{version[0]}.{version[1]}", "site-packages")
+
+
+def store_tag(info):
+    return f"{info.cache_tag}-{info.platform}".replace("/", "_")
+
+
+def _record_entries(dist_info):
+    try:
+        with open(os.path.join(dist_info, "RECORD"), "r", encoding="utf-8", newline="") as f:
+            return [row[0] for row in csv.reader(f) if row]
+    except OSError:
+        return None
+
+
+def _read_metadata(dist_info):
+    with open(os.path.join(dist_info, "METADATA"), "r", encoding="utf-8", errors="replace") as f:
+        return email.parser.Parser().parse(f, headersonly=True)
+
+
+def _portable(path, prefix):
+    # Returns (kind, data) as the store keeps the file, or None when the
+    # venv's own path appears anywhere but a script shebang.
+    with open(path, "rb") as f:
+        data = f.read()
+    kind = "file"
+    match = _SHEBANG_PYTHON.match(data)
+    if match and prefix in match.group(0):
+        kind = "script"
+        data = _PYTHON_PLACEHOLDER + match.group(1) + data[match.end():]
+    if prefix in data:
+        return None
+    return kind, data
+
+
+class PackageStore:
+    def __init__(self, root=None):
+        self.root = root or cache.cache_dir("package-store")
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "dists"), exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def _manifest_path(self, tag, name, version):
+        return os.path.join(self.root, "dists", tag, f"{distindex.normalize_name(name)}-{version}.json")
+
+    def _put_object(self, data, executable):
+        digest = hashlib.sha256(data).hexdigest() + ("x" if executable else "")
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            # Objects are shared by every linked venv; read-only keeps an
+            # edit in one environment from silently changing all of them.
+            os.chmod(tmp_path, 0o555 if executable else 0o444)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _link(self, digest, target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{uuid.uuid4().hex[:8]}.tmp"
+        linked = False
+        if LINKS_SUPPORTED:
+            try:
+                os.link(self._object_path(digest), tmp_path)
+                linked = True
+            except OSError:
+                # Different filesystem or no hardlink support.
+                pass
+        if not linked:
+            shutil.copy2(self._object_path(digest), tmp_path)
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(tmp_path).st_mode) | stat.S_IWUSR)
+        os.replace(tmp_path, target)
+
+    def has(self, tag, name, version):
+        return os.path.exists(self._manifest_path(tag, name, version))
+
+    def versions(self, tag, name):
+        prefix = distindex.normalize_name(name) + "-"
+        directory = os.path.join(self.root, "dists", tag)
+        if not os.path.isdir(directory):
+            return []
+        found = []
+        for entry in os.listdir(directory):
+            if entry.startswith(prefix) and entry.endswith(".json"):
+                version = entry[len(prefix):-5]
+                if "-" not in version:
+                    found.append((os.path.getmtime(os.path.join(directory, entry)), version))
+        return [version for mtime, version in sorted(found, reverse=True)]
+
+    def ingest(self, venv_dir, tag, site_dir):
+        # Moves every installed distribution's files into the store and
+        # replaces them in the venv with hardlinks. Distributions that embed
+        # the venv's own path anywhere but a script shebang stay private.
+        venv_dir = os.path.abspath(venv_dir)
+        prefix = venv_dir.encode()
+        ingested = []
+        for entry in sorted(os.listdir(site_dir)):
+            if not entry.endswith(".dist-info"):
+                continue
+            dist_info = os.path.join(site_dir, entry)
+            records = _record_entries(dist_info)
+            if records is None:
+                continue
+            metadata = _read_metadata(dist_info)
+            name, version = metadata["Name"], metadata["Version"]
+            if not name or not version or self.has(tag, name, version):
+                continue
+
+            paths = []
+            for rel in records:
+                if "__pycache__" in rel or rel.endswith(".pyc"):
+                    continue
+                path = os.path.normpath(os.path.join(site_dir, rel))
+                if os.path.islink(path) or not os.path.isfile(path):
+                    continue
+                location = os.path.relpath(path, venv_dir)
+                if not location.startswith(".."):
+                    paths.append((path, location))
+
+            # Every file is checked before any object is written, so a
+            # distribution that stays private leaves nothing in the store.
+            # Contents are read again below rather than held for the whole
+            # distribution.
+            if not all(_portable(path, prefix) for path, location in paths):
+                continue
+            files = []
+            for path, location in paths:
+                kind, data = _portable(path, prefix)
+                digest = self._put_object(data, bool(os.stat(path).st_mode & stat.S_IXUSR))
+                files.append([kind, location.replace(os.sep, "/"), digest])
+                if kind == "file":
+                    self._link(digest, path)
+
+            manifest_path = self._manifest_path(tag, name, version)
+            os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+            requires = [req for req in metadata.get_all("Requires-Dist") or [] if ";" not in req]
+            with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"name": name, "version": version, "requires": requires,
+                           "files": files, "created": time.time()}, f)
+            os.replace(manifest_path + ".tmp", manifest_path)
+            ingested.append(f"{name}=={version}")
+        return ingested
+
+    def materialize(self, venv_dir, tag, name, version):
+        with open(self._manifest_path(tag, name, version), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        python = os.path.abspath(venvs.venv_python(venv_dir)).encode()
+        for kind, location, digest in manifest["files"]:
+            target = os.path.join(venv_dir, *location.split("/"))
+            if kind == "file":
+                self._link(digest, target)
+                continue
+            with open(self._object_path(digest), "rb") as f:
+                data = f.read().replace(_PYTHON_PLACEHOLDER, b"#!" + python, 1)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(data)
+            os.chmod(target, 0o755)
+        return manifest
+
+    def link_requirements(self, venv_dir, tag, requirements):
+        # Links every pinned requirement found in the store, then follows
+        # their unconditional dependencies to whatever version was stored
+        # most recently. Every pin is linked before any dependency is
+        # followed, so an explicit name==version always wins over the
+        # latest stored version. pip runs afterwards and corrects any
+        # mismatch.
+        pinned = []
+        for line in requirements:
+            m = _PINNED.match("".join(line.split()))
+            if m:
+                pinned.append((m.group(1), m.group(2)))
+        pinned_keys = {distindex.normalize_name(name) for name, version in pinned}
+        pinned.reverse()
+
+        linked = {}
+        follow = []
+        while pinned or follow:
+            name, version = pinned.pop() if pinned else follow.pop()
+            key = distindex.normalize_name(name)
+            if key in linked or (version is None and key in pinned_keys):
+                continue
+            if version is None:
+                versions = self.versions(tag, name)
+                if not versions:
+                    continue
+                version = versions[0]
+            if not self.has(tag, name, version):
+                continue
+            manifest = self.materialize(venv_dir, tag, name, version)
+            linked[key] = f"{manifest['name']}=={version}"
+            for requirement in manifest["requires"]:
+                dep = re.match(r"[A-Za-z0-9][A-Za-z0-9._-]*", requirement.strip())
+                if dep and distindex.normalize_name(dep.group()) not in linked:
+                    follow.append((dep.group(), None))
+        return sorted(linked.values())
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import uuid
+
+import cache
+import distindex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the target interpreter. Everything it needs comes back in a
+# single JSON document so one subprocess answers every later lookup.
+_PROBE_SCRIPT = r"""
+import json, sys, sysconfig
+if sys.version_info < (3, 8):
+    sys.exit("EnvBuilder needs Python 3.8 or newer, found %d.%d" % sys.version_info[:2])
+sys.path.insert(0, sys.argv[1])
+try:
+    from distindex import collect_distributions, marker_environment, stdlib_names
+finally:
+    del sys.path[0]
+
+json.dump({
+    "executable": sys.executable,
+    "version": list(sys.version_info[:3]),
+    "implementation": sys.implementation.name,
+    "cache_tag": sys.implementation.cache_tag,
+    "platform": sysconfig.get_platform(),
+    "path": [p for p in sys.path if p],
+    "stdlib": sorted(stdlib_names()),
+    "markers": marker_environment(),
+    "distributions": collect_distributions(),
+}, sys.stdout)
+"""
+
+
+# Bump whenever the probe output gains or changes fields, so results cached
+# on disk by an older version are probed again.
+PROBE_FORMAT = 2
+
+
+class ProbeError(Exception):
+    pass
+
+
+class InterpreterInfo:
+    def __init__(self, data, index=None):
+        self.data = data
+        self.executable = data["executable"]
+        self.version = tuple(data["version"])
+        self.implementation = data["implementation"]
+        self.cache_tag = data["cache_tag"]
+        self.platform = data["platform"]
+        self.path = data["path"]
+        self.stdlib = frozenset(data["stdlib"])
+        self.markers = data["markers"]
+        self.index = index or distindex.DistributionIndex(data["distributions"])
+
+    @property
+    def version_string(self):
+        return ".".join(str(part) for part in self.version)
+
+
+_local_data = None
+
+
+def current_interpreter():
+    global _local_data
+    if _local_data is None:
+        import sysconfig
+        _local_data = {
+            "executable": sys.executable,
+            "version": list(sys.version_info[:3]),
+            "implementation": sys.implementation.name,
+            "cache_tag": sys.implementation.cache_tag,
+            "platform": sysconfig.get_platform(),
+            "path": [p for p in sys.path if p],
+            "stdlib": sorted(distindex.stdlib_names()),
+            "markers": distindex.marker_environment(),
+            "distributions": [],
+        }
+    # The live index already tracks installs into this interpreter.
+    return InterpreterInfo(_local_data, distindex.get_index())
+
+
+def _signature(executable, paths):
+    # The executable's own mtime catches a replaced interpreter; the
+    # sys.path directories catch packages installed into it since.
+    entries = [os.path.realpath(executable)] + list(paths)
+    signature = []
+    for entry in entries:
+        try:
+            signature.append(os.stat(entry).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+def run_probe(executable, timeout=60):
+    try:
+        result = subprocess.run(
+            [executable, "-c", _PROBE_SCRIPT, HERE],
+            capture_output=True, text=True, timeout=timeout,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ProbeError(f"Could not run {executable}: {e}")
+    if result.returncode != 0:
+        raise ProbeError(f"{executable} failed to report its environment:\n{result.stderr.strip()}")
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        raise ProbeError(f"{executable} returned unreadable probe output")
+
+
+_lock = threading.Lock()
+_memory = {}
+
+
+def _cache_file(key):
+    return os.path.join(cache.cache_dir("probes"), hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def find_executable(executable):
+    # A bare name such as "python3.12" is looked up on PATH, as a shell
+    # would; anything with a directory part is taken as a path.
+    if not os.path.dirname(executable):
+        found = shutil.which(executable)
+        if found:
+            return os.path.abspath(found)
+    return os.path.abspath(executable)
+
+
+def probe_interpreter(executable, use_disk_cache=True):
+    executable = find_executable(executable)
+    if not os.path.exists(executable):
+        raise ProbeError(f"Interpreter not found: {executable}")
+    key = os.path.realpath(executable)
+
+    with _lock:
+        entry = _memory.get(key)
+    if entry is not None and _signature(executable, entry[1].path) == entry[0]:
+        return entry[1]
+
+    if entry is None and use_disk_cache:
+        try:
+            with open(_cache_file(key), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("format") != PROBE_FORMAT:
+                raise KeyError("format")
+            info = InterpreterInfo(stored["data"])
+            if _signature(executable, info.path) == stored["signature"]:
+                with _lock:
+                    _memory[key] = (stored["signature"], info)
+                return info
+        except (OSError, ValueError, KeyError):
+            pass
+
+    info = InterpreterInfo(run_probe(executable))
+    signature = _signature(executable, info.path)
+    with _lock:
+        _memory[key] = (signature, info)
+    if use_disk_cache:
+        # Written aside and renamed, so a concurrent reader never sees a
+        # partial file.
+        path = _cache_file(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"format": PROBE_FORMAT, "signature": signature, "data": info.data}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return info
@@ -0,0 +1,63 @@
+import distindex
+import lockfile
+import resolver
+
+CONDA_HEADER = "name: env\nchannels:\n  - conda-forge\ndependencies:\n"
+
+
+def is_external(mod, ver):
+    return ver != resolver.STANDARD_LIBRARY and "(local file)" not in mod
+
+
+def display_lines(versions, output_type="pip", include_comments=True):
+    # What the output pane shows: every import, including the standard
+    # library and local files that do not go into the environment file.
+    lines = [] if output_type == "pip" else CONDA_HEADER.splitlines()
+    prefix, pin = ("", "==") if output_type == "pip" else ("  - ", "=")
+    for mod, ver in versions:
+        if ver == resolver.STANDARD_LIBRARY:
+            line = f"{prefix}{mod}  # standard library" if include_comments else f"{prefix}{mod}"
+        elif "(local file)" in mod:
+            line = f"{prefix}{mod}  # local file" if include_comments else f"{prefix}{mod}"
+        else:
+            line = f"{prefix}{mod}{pin}{ver}" if ver else f"{prefix}{mod}  # not installed" if include_comments else f"{prefix}{mod}"
+        lines.append(line)
+    return lines
+
+
+def environment_file(versions, package_name, output_type="pip"):
+    content = "" if output_type == "pip" else CONDA_HEADER
+    prefix, pin = ("", "==") if output_type == "pip" else ("  - ", "=")
+    for mod, ver in versions:
+        if is_external(mod, ver):
+            name = package_name(mod)
+            content += f"{prefix}{name}{pin}{ver}\n" if ver else f"{prefix}{name}  # not installed\n"
+    return content
+
+
+def requirements_content(deps, modules, output_type="pip", lock=False, target=None):
+    # What Save writes for modules, resolved by deps (a resolver.Resolver).
+    # Returns (content, LockResult or None).
+    target = target or deps.target()
+    versions = deps.versions(modules, target)
+    if not lock:
+        return environment_file(versions, lambda mod: deps.package_name(mod, target), output_type), None
+    names = [deps.package_name(mod, target) for mod, ver in versions if is_external(mod, ver)]
+    result = lockfile.lock(target, names)
+    return locked_file(result, output_type), result
+
+
+def locked_file(lock, output_type="pip"):
+    content = "" if output_type == "pip" else CONDA_HEADER
+    prefix, pin = ("", "==") if output_type == "pip" else ("  - ", "=")
+    conflicts = {}
+    for name, version, requirement, required_by in lock.conflicts:
+        conflicts.setdefault(distindex.normalize_name(name), f"{requirement} from {required_by}")
+    for name, version in lock.pins:
+        line = f"{prefix}{name}{pin}{version}"
+        conflict = conflicts.get(distindex.normalize_name(name))
+        content += f"{line}  # conflicts with {conflict}\n" if conflict else f"{line}\n"
+    for requirement, required_by in lock.missing:
+        note = f"not installed, required by {required_by}" if required_by else "not installed"
+        content += f"{prefix}{requirement}  # {note}\n"
+    return content
@@ -0,0 +1,61 @@
+import aliasdb
+import probe
+
+STANDARD_LIBRARY = "standard library"
+
+# Import names that never match their distribution and are too common to
+# leave to the alias database alone.
+COMMON_ALIASES = {
+    "PIL": "Pillow",
+    "cv2": "opencv-python",
+    "skimage": "scikit-image",
+    "sklearn": "scikit-learn",
+    "plt": "matplotlib",
+    "np": "numpy",
+    "pd": "pandas",
+}
+
+
+class Resolver:
+    def __init__(self, import_to_package, interpreter=None, aliases=None):
+        self.import_to_package = import_to_package
+        self.interpreter = interpreter
+        self._aliases = aliases
+
+    @property
+    def aliases(self):
+        if self._aliases is None:
+            self._aliases = aliasdb.default_database()
+        return self._aliases
+
+    def alias(self, mod):
+        return self.import_to_package.get(mod) or self.aliases.lookup(mod) or mod
+
+    def target(self):
+        if self.interpreter:
+            return probe.probe_interpreter(self.interpreter)
+        return probe.current_interpreter()
+
+    def is_standard_lib(self, mod, target=None):
+        stdlib = (target or self.target()).stdlib
+        return mod in stdlib or self.import_to_package.get(mod, mod) in stdlib
+
+    def package_name(self, mod, target=None):
+        found = (target or self.target()).index.lookup(mod)
+        if found:
+            return found[0]
+        return self.alias(mod)
+
+    def versions(self, modules, target=None):
+        target = target or self.target()
+        result = []
+        for mod in modules:
+            if self.is_standard_lib(mod, target):
+                result.append((mod, STANDARD_LIBRARY))
+                continue
+            found = target.index.lookup(mod)
+            if found:
+                result.append((mod, found[1]))
+            else:
+                result.append((mod, target.index.version(self.alias(mod))))
+        return result
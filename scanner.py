@@ -0,0 +1,318 @@
+import ast
+import os
+from collections import namedtuple
+
+import cache
+import fastscan
+import instrument
+import notebooks
+
+SOURCE_EXTENSIONS = (".py", ".ipynb")
+# Wheels, eggs and sdists are scanned in place by archives.scan_archive.
+ARCHIVE_EXTENSIONS = (".zip", ".whl", ".egg", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+SKIP_DIRS = {
+    ".git", ".hg", ".svn", "__pycache__", ".ipynb_checkpoints",
+    ".tox", ".nox", ".venv", "venv", "node_modules", "site-packages",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache",
+}
+
+# Bump whenever the set of imports reported for a file can change, so
+# persistent caches written by older versions are discarded.
+SCAN_VERSION = "4"
+
+# timings maps a phase name to (seconds, net allocated blocks) when the scan
+# was asked to measure itself.
+# raw is what the import cache stores for the file, when it differs from
+# imports.
+ScanResult = namedtuple("ScanResult", ["path", "imports", "error", "fingerprint", "timings", "raw"],
+                        defaults=[None, None, None])
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+# isfile is os.path.isfile, or a membership test against an archive's file
+# list when the "directory" is inside an archive.
+def is_local_module(base_dir, module_name, isfile=os.path.isfile):
+    path = os.path.join(base_dir, module_name)
+    return isfile(path + ".py") or isfile(os.path.join(path, "__init__.py"))
+
+
+def package_root(directory, isfile=os.path.isfile):
+    # The directory above the outermost package that contains directory,
+    # i.e. where "import pkg.sub" has to start from.
+    while isfile(os.path.join(directory, "__init__.py")):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return directory
+
+
+def local_label(module_name):
+    return f"{module_name} (local file)"
+
+
+def import_nodes(source, fast=True, validate=True):
+    # The lexer only looks at import statements. With validate, a syntax
+    # error anywhere else in the source still raises, as ast.parse would;
+    # the syntax check alone is cheaper than building and walking the tree
+    # in Python. Notebook cells, whose errors are never reported, skip it.
+    if fast:
+        try:
+            nodes = fastscan.import_nodes(source)
+        except fastscan.Ambiguous:
+            pass
+        else:
+            if validate:
+                # A file read as utf-8 keeps its byte order mark, which
+                # compile() rejects in a str.
+                body = source[1:] if source.startswith("\ufeff") else source
+                compile(body, "<unknown>", "exec", ast.PyCF_ONLY_AST, dont_inherit=True)
+            return nodes
+    tree = ast.parse(source)
+    return [node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def raw_imports(nodes):
+    # Top-level module names as written. Relative imports are prefixed
+    # with "."; whether the rest are local depends on the files next to
+    # the importing one, so that is left to classify.
+    names = set()
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            found = [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            found = [node.module.split('.')[0]]
+        else:
+            continue
+        prefix = "." if getattr(node, "level", 0) else ""
+        names.update(prefix + name for name in found)
+    return names
+
+
+def classify(names, base_dir, isfile=os.path.isfile):
+    imports = set()
+    search = [base_dir]
+    root = package_root(base_dir, isfile)
+    if root != base_dir:
+        search.append(root)
+    for name in names:
+        # Relative imports always stay inside the project.
+        if name.startswith("."):
+            imports.add(local_label(name[1:]))
+        elif any(is_local_module(d, name, isfile) for d in search):
+            imports.add(local_label(name))
+        else:
+            imports.add(name)
+    return imports
+
+
+def imports_from_nodes(nodes, base_dir, isfile=os.path.isfile):
+    return classify(raw_imports(nodes), base_dir, isfile)
+
+
+def scan_source(source, base_dir, fast=True):
+    return imports_from_nodes(import_nodes(source, fast), base_dir)
+
+
+def raw_file_imports(filepath, fast=True, timings=None):
+    if filepath.endswith(".py"):
+        with instrument.measure(timings, "read"):
+            with open(filepath, "r", encoding="utf-8") as f:
+                source = f.read()
+        with instrument.measure(timings, "parse"):
+            return raw_imports(import_nodes(source, fast))
+
+    names = set()
+    with instrument.measure(timings, "notebook"):
+        cells = notebooks.read_code_cells(filepath)
+    with instrument.measure(timings, "parse"):
+        for source in cells:
+            try:
+                names |= raw_imports(import_nodes(source, fast, validate=False))
+            except Exception:
+                continue
+    return names
+
+
+def scan_file(filepath, fast=True, timings=None):
+    if filepath.endswith(SOURCE_EXTENSIONS):
+        return classify(raw_file_imports(filepath, fast, timings), os.path.dirname(filepath))
+
+    if is_archive(filepath):
+        import archives
+
+        imports = set()
+        with instrument.measure(timings, "archive"):
+            # Members that fail to parse are skipped, as notebook cells are;
+            # scan_path reports them one by one.
+            for result in archives.scan_archive(filepath, fast):
+                imports |= result.imports
+        return imports
+
+    raise ValueError(f"Unsupported file type: {filepath}")
+
+
+def iter_source_files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in SKIP_DIRS and not os.path.isfile(os.path.join(dirpath, d, "pyvenv.cfg"))
+        )
+        for name in sorted(filenames):
+            if name.endswith(SOURCE_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def _cached_form(filepath, raw):
+    # What the import cache holds for a file: raw names, classified again on
+    # every read, so a sibling module created or deleted since is noticed.
+    # An archive's imports only depend on its own members and are stored
+    # classified.
+    if is_archive(filepath):
+        return raw
+    return classify(raw, os.path.dirname(filepath))
+
+
+def _scan_one(filepath, with_fingerprint=False, fast=True, timed=False):
+    timings = {} if timed else None
+    try:
+        # Fingerprint before parsing so an edit racing the scan is seen as a
+        # change next time rather than cached under the new contents.
+        with instrument.measure(timings, "fingerprint"):
+            fingerprint = cache.file_fingerprint(filepath) if with_fingerprint else None
+        if is_archive(filepath):
+            return _scan_archive_file(filepath, fingerprint, fast, timings)
+        if with_fingerprint:
+            raw = frozenset(raw_file_imports(filepath, fast, timings))
+            imports = frozenset(_cached_form(filepath, raw))
+            return ScanResult(filepath, imports, None, fingerprint, timings, raw)
+        return ScanResult(filepath, frozenset(scan_file(filepath, fast, timings)), None, fingerprint, timings)
+    except Exception as e:
+        return ScanResult(filepath, frozenset(), f"{type(e).__name__}: {e}", None, timings)
+
+
+def _scan_archive_file(filepath, fingerprint, fast, timings):
+    # The whole archive as one result. Member errors are joined into its
+    # error, which keeps it out of the import cache; the imports of the
+    # members that did parse are kept.
+    import archives
+
+    imports = set()
+    errors = []
+    with instrument.measure(timings, "archive"):
+        for result in archives.scan_archive(filepath, fast):
+            imports |= result.imports
+            if result.path == filepath:
+                errors.append(result.error)
+            elif result.error:
+                errors.append(f"{os.path.relpath(result.path, filepath)}: {result.error}")
+    return ScanResult(filepath, frozenset(imports), "; ".join(errors) or None, fingerprint, timings)
+
+
+def _scan_chunk(paths, with_fingerprint, fast, timed=False):
+    return [_scan_one(path, with_fingerprint, fast, timed) for path in paths]
+
+
+def scan_files(paths, workers=None, import_cache=None, fast=True, timed=False):
+    paths = list(paths)
+    if import_cache is None:
+        yield from _scan_uncached(paths, workers, False, fast, timed)
+        return
+
+    pending = []
+    for path in paths:
+        timings = {} if timed else None
+        with instrument.measure(timings, "cache"):
+            imports = import_cache.get(path)
+        if imports is None:
+            pending.append(path)
+        else:
+            yield ScanResult(path, frozenset(_cached_form(path, imports)), None, None, timings)
+
+    for result in _scan_uncached(pending, workers, True, fast, timed):
+        if result.error is None:
+            with instrument.measure(result.timings, "cache"):
+                import_cache.put(result.path, result.raw or result.imports, result.fingerprint)
+        yield result
+    with instrument.phase("cache flush"):
+        import_cache.flush()
+
+
+def _scan_uncached(paths, workers, with_fingerprint, fast, timed=False):
+    if not paths:
+        return
+    if workers is None:
+        workers = available_cores()
+    workers = max(1, min(workers, len(paths)))
+
+    if workers == 1:
+        for path in paths:
+            yield _scan_one(path, with_fingerprint, fast, timed)
+        return
+
+    # Imported here: concurrent.futures pulls in multiprocessing, which
+    # costs more at startup than a single-file scan takes in total.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    # Small chunks keep results streaming back; large enough ones keep
+    # pickling overhead per file low.
+    chunk_size = max(1, min(64, len(paths) // (workers * 8)))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_scan_chunk, paths[i:i + chunk_size], with_fingerprint, fast, timed)
+                   for i in range(0, len(paths), chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def scan_path(path, workers=None, import_cache=None, fast=True, timed=False):
+    if os.path.isdir(path):
+        return scan_files(iter_source_files(path), workers, import_cache, fast, timed)
+    if is_archive(path):
+        return _scan_archive(path, import_cache, fast)
+    return scan_files([path], 1, import_cache, fast, timed)
+
+
+def _scan_archive(path, import_cache, fast):
+    # One result per member; the cache holds the archive's merged imports.
+    import archives
+
+    imports = import_cache.get(path) if import_cache else None
+    if imports is not None:
+        yield ScanResult(path, frozenset(imports), None, None)
+        return
+    fingerprint = cache.file_fingerprint(path) if import_cache else None
+    merged = set()
+    failed = False
+    for result in archives.scan_archive(path, fast):
+        merged |= result.imports
+        failed = failed or result.error is not None
+        yield result
+    # An archive with failed members is scanned again next time, so its
+    # errors are reported on every run.
+    if import_cache and not failed:
+        import_cache.put(path, merged, fingerprint)
+        import_cache.flush()
+
+
+def open_cache():
+    return cache.open_default_cache(SCAN_VERSION)
+
+
+def merge_results(results):
+    imports = set()
+    for result in results:
+        imports.update(result.imports)
+    return sorted(imports)
@@ -0,0 +1,61 @@
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cli
+
+
+class ScanStrictTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write("ok.py", "import flask\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def run_cli(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            rc = cli.main(list(argv))
+        return rc, stdout.getvalue(), stderr.getvalue()
+
+    def test_clean_project_passes(self):
+        rc, out, err = self.run_cli("scan", self.directory, "--strict", "--no-cache", "--workers", "1")
+        self.assertEqual(rc, 0)
+        self.assertEqual(out, "flask\n")
+
+    def test_unparsable_file_fails_strict(self):
+        self.write("m.py", "import os\nimport requests\ndef broken(:\n    pass\n")
+        rc, out, err = self.run_cli("scan", self.directory, "--strict", "--no-cache", "--workers", "1")
+        self.assertEqual(rc, 1)
+        self.assertIn("m.py", err)
+        self.assertIn("SyntaxError", err)
+        # The rest of the project is still listed.
+        self.assertEqual(out, "flask\n")
+
+    def test_unparsable_file_without_strict(self):
+        self.write("m.py", "def broken(:\n")
+        rc, out, err = self.run_cli("scan", self.directory, "--no-cache", "--workers", "1")
+        self.assertEqual(rc, 0)
+        self.assertIn("SyntaxError", err)
+
+    def test_unparsable_entry_point_fails_strict(self):
+        self.write("main.py", "import ok\nimport helper\n")
+        self.write("helper.py", "import yaml\nclass Broken(\n")
+        rc, out, err = self.run_cli("scan", os.path.join(self.directory, "main.py"), "--strict", "--no-cache")
+        self.assertEqual(rc, 1)
+        self.assertIn("helper.py", err)
+
+
+if __name__ == "__main__":
+    unittest.main()
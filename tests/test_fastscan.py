@@ -0,0 +1,132 @@
+import ast
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastscan
+import scanner
+
+
+def _key(node):
+    if isinstance(node, ast.Import):
+        return ("import", "", 0, tuple((alias.name, alias.asname) for alias in node.names))
+    return ("from", node.module or "", node.level, tuple((alias.name, alias.asname) for alias in node.names))
+
+
+def _with_ast(source):
+    tree = ast.parse(source)
+    nodes = [node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return sorted(_key(node) for node in nodes)
+
+
+FIXTURES = {
+    "simple": "import os\nimport sys as system, json\nfrom collections import OrderedDict\n",
+    "relative": "from . import sibling\nfrom ..pkg.mod import name as alias\nfrom .mod import *\n",
+    "type checking": (
+        "from typing import TYPE_CHECKING\n"
+        "if TYPE_CHECKING:\n"
+        "    from pandas import DataFrame\n"
+        "    import numpy.typing as npt\n"
+        "if TYPE_CHECKING: import polars\n"
+    ),
+    "nested": (
+        "def f():\n"
+        "    try:\n"
+        "        import ujson as json\n"
+        "    except ImportError:\n"
+        "        import json\n"
+        "    class C:\n"
+        "        from abc import ABC\n"
+        "    return json\n"
+    ),
+    "parenthesized": "from typing import (\n    Any,  # comment with import os\n    Dict,\n)\n",
+    "continuation": "import os, \\\n    sys\nfrom a.b import \\\n    c\n",
+    "semicolons": "x = 1; import a; import b\n",
+    "multi-line strings": (
+        'doc = """\nimport not_a_module\nfrom fake import thing\n"""\n'
+        "other = '''\nimport also_fake\n'''\n"
+        "import real\n"
+    ),
+    "escaped quotes": (
+        "s = 'it\\'s import fake'\n"
+        't = "say \\"from x import y\\""\n'
+        'u = """a \\""" import fake2 """\n'
+        "import real2\n"
+    ),
+    "comments": "# import commented\nimport kept  # from x import y\n",
+    "yield and raise from": (
+        "def g():\n"
+        "    yield from range(3)\n"
+        "    raise ValueError('x') from None\n"
+        "import after\n"
+    ),
+    "continued raise from": "try:\n    pass\nexcept E as e:\n    raise Other() \\\n        from e\nimport tail\n",
+    "crlf": "import a\r\nif x:\r\n    import b\r\n",
+    "bom and tabs": "\ufeffimport first\nif y:\n\timport tabbed\n",
+    "prefixed strings": "p = r'import raw'\nb = b\"from bytes import x\"\nf = f'{1} import fmt'\nimport z\n",
+}
+
+
+class FastScanTest(unittest.TestCase):
+    def test_matches_ast(self):
+        for name, source in FIXTURES.items():
+            with self.subTest(name):
+                nodes = fastscan.import_nodes(source)
+                self.assertEqual(sorted(_key(node) for node in nodes), _with_ast(source.lstrip("\ufeff")))
+
+    def test_scanner_results_match_ast(self):
+        for name, source in FIXTURES.items():
+            with self.subTest(name):
+                fast = scanner.raw_imports(scanner.import_nodes(source, fast=True))
+                slow = scanner.raw_imports(scanner.import_nodes(source.lstrip("\ufeff"), fast=False))
+                self.assertEqual(fast, slow)
+
+    def test_ambiguous_sources_fall_back(self):
+        ambiguous = {
+            "unterminated string": "s = 'never closed\nimport x\n",
+            "unclosed parenthesis": "from a import (b,\n",
+            "keyword as expression": "x = import_it + import\n",
+        }
+        for name, source in ambiguous.items():
+            with self.subTest(name):
+                with self.assertRaises(fastscan.Ambiguous):
+                    fastscan.import_nodes(source)
+
+    def test_syntax_errors_outside_imports_are_reported(self):
+        # The lexer alone never sees the broken def; the scan must not
+        # report the file as parsed.
+        source = "import os\nimport requests\ndef broken(:\n    pass\n"
+        self.assertEqual(len(fastscan.import_nodes(source)), 2)
+        with self.assertRaises(SyntaxError):
+            scanner.import_nodes(source)
+        with self.assertRaises(SyntaxError):
+            scanner.scan_source(source, ".")
+
+    def test_unparsable_file_is_a_scan_error(self):
+        import tempfile
+
+        directory = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(directory, "m.py"), "w", encoding="utf-8") as f:
+                f.write("import os\ndef broken(:\n    pass\n")
+            results = list(scanner.scan_path(directory, workers=1))
+            self.assertEqual(len(results), 1)
+            self.assertIn("SyntaxError", results[0].error)
+        finally:
+            import shutil
+
+            shutil.rmtree(directory)
+
+    def test_fallback_agrees_with_ast(self):
+        # scanner.import_nodes falls back to ast when the lexer gives up.
+        # A ")" inside a comment ends the lexer's view of the statement early.
+        source = "from a import (b,  # see (c)\n    d)\nimport e\n"
+        with self.assertRaises(fastscan.Ambiguous):
+            fastscan.import_nodes(source)
+        self.assertEqual(sorted(_key(node) for node in scanner.import_nodes(source)), _with_ast(source))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import notebooks
+
+
+def _notebook(cells, **extra):
+    data = {"cells": cells, "metadata": {"kernelspec": {"name": "python3"}}, "nbformat": 4, "nbformat_minor": 5}
+    data.update(extra)
+    return data
+
+
+def _code(source, **extra):
+    cell = {"cell_type": "code", "execution_count": None, "metadata": {}, "outputs": [], "source": source}
+    cell.update(extra)
+    return cell
+
+
+def _expected(data):
+    # What json.load gives for the same document.
+    cells = []
+    for cell in data["cells"]:
+        if cell.get("cell_type") == "code":
+            source = cell["source"]
+            cells.append("".join(source) if isinstance(source, list) else source)
+    return cells
+
+
+FIXTURES = {
+    "plain": _notebook([_code(["import os\n", "import sys"]), {"cell_type": "markdown", "metadata": {},
+                                                                "source": ["# import nothing"]}]),
+    "string source": _notebook([_code("import numpy as np\nprint(np.pi)")]),
+    "escapes": _notebook([_code(['x = "a \\"quoted\\" \\\\ path\\tand\\ttabs"\n', "import re\n",
+                                 "s = '\\u00e9\\n'\n"])]),
+    "non-ascii": _notebook([_code(["# café ☃ \U0001f600\n", "import json\n"])]),
+    "empty": _notebook([]),
+    "empty cell": _notebook([{}, _code([]), _code("")]),
+    "outputs": _notebook([_code(["import pandas\n"], execution_count=3, outputs=[
+        {"output_type": "execute_result", "execution_count": 3, "metadata": {},
+         "data": {"text/plain": ["  a  b\n", "0 1 [2]\n"], "image/png": "iVBORw0KGgo" * 500}},
+        {"output_type": "stream", "name": "stdout", "text": ["{not: json}]\n"]},
+    ]), _code(["import requests\n"])]),
+    "nested metadata": _notebook([_code(["import torch\n"], metadata={"tags": ["a", {"b": [1, 2.5, None, True]}],
+                                                                      "collapsed": False})]),
+    "cells not first": {"metadata": {}, "nbformat": 4, "nbformat_minor": 2,
+                        "cells": [_code(["from a import b\n"])]},
+}
+
+
+class StreamingReaderTest(unittest.TestCase):
+    def assertReadsLikeJson(self, data, **dump_options):
+        raw = json.dumps(data, **dump_options).encode("utf-8")
+        expected = _expected(json.loads(raw))
+        # Small chunks push every token across a buffer boundary.
+        for chunk_size in (1, 3, 7, 64, notebooks.CHUNK_SIZE):
+            with self.subTest(chunk_size=chunk_size):
+                cells = list(notebooks.iter_code_cells(io.BytesIO(raw), chunk_size))
+                self.assertEqual(cells, expected)
+
+    def test_fixtures(self):
+        for name, data in FIXTURES.items():
+            with self.subTest(name):
+                self.assertReadsLikeJson(data)
+
+    def test_ascii_escaped_surrogate_pairs(self):
+        # ensure_ascii writes characters outside the BMP as \\ud83d\\ude00.
+        data = _notebook([_code(["print('\U0001f600 é')\n", "import emoji\n"])])
+        self.assertIn(b"\\ud83d\\ude00", json.dumps(data).encode("ascii"))
+        self.assertReadsLikeJson(data)
+
+    def test_indented_and_compact_layouts(self):
+        for name, data in FIXTURES.items():
+            with self.subTest(name):
+                self.assertReadsLikeJson(data, indent=1, ensure_ascii=False)
+                self.assertReadsLikeJson(data, separators=(",", ":"))
+
+    def test_byte_order_mark(self):
+        raw = b"\xef\xbb\xbf" + json.dumps(FIXTURES["plain"]).encode("utf-8")
+        self.assertEqual(list(notebooks.iter_code_cells(io.BytesIO(raw), 2)), _expected(FIXTURES["plain"]))
+
+    def test_old_format_is_rejected(self):
+        raw = json.dumps({"nbformat": 3, "worksheets": [{"cells": []}]}).encode("utf-8")
+        with self.assertRaises(notebooks.NotebookFormatError):
+            list(notebooks.iter_code_cells(io.BytesIO(raw)))
+
+    def test_truncated_document_is_an_error(self):
+        raw = json.dumps(FIXTURES["outputs"]).encode("utf-8")
+        with self.assertRaises(ValueError):
+            list(notebooks.iter_code_cells(io.BytesIO(raw[:len(raw) // 2])))
+
+    def test_read_code_cells_accepts_paths_and_files(self):
+        import tempfile
+
+        raw = json.dumps(FIXTURES["escapes"]).encode("utf-8")
+        fd, path = tempfile.mkstemp(suffix=".ipynb")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            self.assertEqual(notebooks.read_code_cells(path), _expected(FIXTURES["escapes"]))
+        finally:
+            os.remove(path)
+        self.assertEqual(notebooks.read_code_cells(io.BytesIO(raw)), _expected(FIXTURES["escapes"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+import cache
+import distindex
+
+DEFAULT_TEMPLATE_BYTES = 5 * 1024 ** 3
+
+_REQUIREMENT_NAME = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(.*)$")
+_FIXUP_LIMIT = 1024 * 1024
+# Windows .exe launchers (pip.exe, console scripts) embed the environment's
+# interpreter path and cannot be rewritten by relocate, so a clone would
+# keep installing into the template. Templates are not used there.
+CLONING_SUPPORTED = os.name != 'nt'
+
+
+def scripts_dir(venv_dir):
+    return os.path.join(venv_dir, "Scripts" if os.name == 'nt' else "bin")
+
+
+def venv_python(venv_dir):
+    return os.path.join(scripts_dir(venv_dir), "python.exe" if os.name == 'nt' else "python")
+
+
+def venv_pip(venv_dir):
+    return os.path.join(scripts_dir(venv_dir), "pip.exe" if os.name == 'nt' else "pip")
+
+
+def requirement_lines(text):
+    lines = []
+    for line in text.splitlines():
+        line = line.split(" #", 1)[0].split("\t#", 1)[0].strip()
+        if line and not line.startswith("#"):
+            lines.append(line)
+    return lines
+
+
+def normalize_requirements(text):
+    lines = set()
+    for line in requirement_lines(text):
+        line = "".join(line.split())
+        m = _REQUIREMENT_NAME.match(line)
+        if m:
+            line = distindex.normalize_name(m.group(1)) + m.group(2)
+        lines.add(line)
+    return "\n".join(sorted(lines))
+
+
+def tree_size(path):
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def relocate(venv_dir, old_prefix, new_prefix):
+    # venv writes its absolute location into pyvenv.cfg, the activate
+    # scripts and every console-script shebang. Windows .exe launchers embed
+    # it too but cannot be rewritten in place; see CLONING_SUPPORTED.
+    old, new = old_prefix.encode(), new_prefix.encode()
+    candidates = [os.path.join(venv_dir, "pyvenv.cfg")]
+    bin_dir = scripts_dir(venv_dir)
+    if os.path.isdir(bin_dir):
+        candidates.extend(os.path.join(bin_dir, name) for name in os.listdir(bin_dir))
+
+    for path in candidates:
+        if os.path.islink(path) or not os.path.isfile(path) or path.endswith(".exe"):
+            continue
+        if os.path.getsize(path) > _FIXUP_LIMIT:
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if old in data:
+            mode = os.stat(path).st_mode
+            with open(path, "wb") as f:
+                f.write(data.replace(old, new))
+            os.chmod(path, mode)
+
+
+class TemplateStore:
+    def __init__(self, root=None, max_bytes=DEFAULT_TEMPLATE_BYTES):
+        self.root = root or cache.cache_dir("venv-templates")
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, interpreter, requirements):
+        interpreter = os.path.realpath(interpreter)
+        try:
+            stamp = os.stat(interpreter).st_mtime_ns
+        except OSError:
+            stamp = None
+        payload = f"{interpreter}\n{stamp}\n{normalize_requirements(requirements)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def _manifest(self, key):
+        try:
+            with open(os.path.join(self._entry(key), "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, key, manifest):
+        path = os.path.join(self._entry(key), "manifest.json")
+        # Unique per writer: concurrent clones of one template each record
+        # their use.
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def __contains__(self, key):
+        return self._manifest(key) is not None
+
+    def clone(self, key, venv_dir):
+        if not CLONING_SUPPORTED:
+            return False
+        manifest = self._manifest(key)
+        if manifest is None or os.path.exists(venv_dir):
+            return False
+
+        venv_dir = os.path.abspath(venv_dir)
+        tmp_dir = f"{venv_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        try:
+            shutil.copytree(os.path.join(self._entry(key), "env"), tmp_dir, symlinks=True)
+            relocate(tmp_dir, manifest["prefix"], venv_dir)
+            os.replace(tmp_dir, venv_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+
+        manifest["last_used"] = time.time()
+        self._write_manifest(key, manifest)
+        return True
+
+    def add(self, key, venv_dir, interpreter):
+        if not CLONING_SUPPORTED or key in self:
+            return
+        venv_dir = os.path.abspath(venv_dir)
+        tmp_entry = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            shutil.copytree(venv_dir, os.path.join(tmp_entry, "env"), symlinks=True)
+            now = time.time()
+            manifest = {
+                "prefix": venv_dir,
+                "interpreter": os.path.realpath(interpreter),
+                "created": now,
+                "last_used": now,
+                "size": tree_size(tmp_entry),
+            }
+            with open(os.path.join(tmp_entry, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_entry, self._entry(key))
+        except OSError:
+            # Another process stored the same template first, or the disk is full.
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self):
+        found = []
+        for key in os.listdir(self.root):
+            if key.startswith("."):
+                continue
+            manifest = self._manifest(key)
+            if manifest is not None:
+                found.append((key, manifest))
+        return found
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[1].get("last_used", 0))
+        total = sum(manifest.get("size", 0) for key, manifest in entries)
+        # Never evict the newest template, even if it alone exceeds the limit.
+        while entries[:-1] and total > self.max_bytes:
+            key, manifest = entries.pop(0)
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= manifest.get("size", 0)
+
+    def clear(self):
+        for key, manifest in self.entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
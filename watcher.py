@@ -0,0 +1,345 @@
+import os
+import select
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import modgraph
+import scanner
+
+# A save in most editors is several events (write, rename, chmod); changes
+# are collected until the tree has been quiet this long.
+DEBOUNCE_SECONDS = 0.3
+# A tree that never goes quiet, e.g. a checkout, still updates this often.
+MAX_DELAY_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+
+Update = namedtuple("Update", ["imports", "errors", "added", "removed", "rescanned", "seconds"])
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+def _watched_dirs(root):
+    if os.path.isfile(root):
+        # A single archive: its directory is watched, not the whole tree.
+        yield os.path.dirname(root)
+        return
+    # Same pruning as scanner.iter_source_files.
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            d for d in dirnames
+            if d not in scanner.SKIP_DIRS and not os.path.isfile(os.path.join(dirpath, d, "pyvenv.cfg"))
+        ]
+        yield dirpath
+
+
+class InotifyWatcher:
+    kind = "inotify"
+
+    def __init__(self, roots):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        try:
+            for root in roots:
+                self._add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, root):
+        import ctypes
+
+        for directory in _watched_dirs(root):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                # ENOSPC here means fs.inotify.max_user_watches is too low
+                # for the tree; the caller falls back to polling.
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self._dirs[wd] = directory
+
+    def _remove_tree(self, root):
+        prefix = root + os.sep
+        for wd, directory in list(self._dirs.items()):
+            if directory == root or directory.startswith(prefix):
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+
+    def changes(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                self._event(wd, mask, name, changed)
+        return changed
+
+    def _event(self, wd, mask, name, changed):
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost; everything has to be looked at again.
+            changed.update(self._dirs.values())
+            return
+        directory = self._dirs.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            del self._dirs[wd]
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            changed.add(directory)
+            return
+        path = os.path.join(directory, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and name not in scanner.SKIP_DIRS:
+                try:
+                    self._add_tree(path)
+                except OSError:
+                    pass
+            changed.add(path)
+        elif name == "pyvenv.cfg":
+            # A virtual environment is being created in the tree; its
+            # site-packages is not part of the project.
+            self._remove_tree(directory)
+            changed.add(directory)
+        elif name.endswith(scanner.SOURCE_EXTENSIONS) or scanner.is_archive(name):
+            changed.add(path)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    kind = "polling"
+
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self.roots = list(roots)
+        self.interval = interval
+        self._snapshot = self._take()
+        self._taken = time.monotonic()
+
+    def _take(self):
+        snapshot = {}
+        for root in self.roots:
+            for path in [root] if os.path.isfile(root) else scanner.iter_source_files(root):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def changes(self, timeout):
+        wait = self._taken + self.interval - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            if wait > timeout:
+                return set()
+        snapshot = self._take()
+        self._taken = time.monotonic()
+        previous, self._snapshot = self._snapshot, snapshot
+        changed = set(previous.keys() ^ snapshot.keys())
+        changed.update(path for path, stamp in snapshot.items() if previous.get(path, stamp) != stamp)
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(roots, polling=False, interval=POLL_INTERVAL):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            # AttributeError: a libc without inotify_init1.
+            pass
+    return PollingWatcher(roots, interval)
+
+
+def _module_name(path):
+    name = os.path.basename(path)
+    if name == "__init__.py":
+        return os.path.basename(os.path.dirname(path))
+    return os.path.splitext(name)[0]
+
+
+class ProjectImports:
+    # The import set of a file or a folder, kept current one changed file
+    # at a time. A single file is followed through its local modules, as
+    # in extract_imports, unless follow is False.
+    def __init__(self, path, import_cache=None, fast=True, follow=True):
+        self.path = os.path.abspath(path)
+        self.is_dir = os.path.isdir(self.path)
+        self.import_cache = import_cache
+        self.fast = fast
+        self.graph = None
+        if follow and not self.is_dir and not scanner.is_archive(self.path):
+            self.graph = modgraph.ModuleGraph(modgraph.project_roots(self.path), fast)
+        self.per_file = {}
+        self.errors = {}
+        self._imports = frozenset()
+
+    def roots(self):
+        if scanner.is_archive(self.path):
+            return [self.path]
+        if self.graph is not None:
+            # The entry's directory is usually inside the second root.
+            roots = self.graph.roots
+            return [root for root in roots
+                    if not any(root.startswith(other + os.sep) for other in roots)]
+        return [self.path if self.is_dir else os.path.dirname(self.path)]
+
+    def refresh(self, changed=None):
+        # changed is a set of paths reported by a watcher; None rescans
+        # everything.
+        start = time.perf_counter()
+        if self.graph is not None:
+            imports, errors, rescanned = self._refresh_graph(changed)
+        else:
+            imports, errors, rescanned = self._refresh_files(changed)
+        previous, self._imports = self._imports, imports
+        return Update(sorted(imports), errors, sorted(imports - previous), sorted(previous - imports),
+                      rescanned, time.perf_counter() - start)
+
+    def _refresh_graph(self, changed):
+        if changed is None:
+            self.graph = modgraph.ModuleGraph(self.graph.roots, self.fast)
+        else:
+            self.graph.invalidate(changed)
+        parses = self.graph.parses
+        imports = self.graph.dependencies(self.path)
+        reachable = self.graph.reachable(self.path)
+        errors = sorted((path, error) for path, error in self.graph.errors.items() if path in reachable)
+        return imports, errors, self.graph.parses - parses
+
+    def _included(self, path):
+        if not self.is_dir:
+            return path == self.path
+        relative = os.path.relpath(path, self.path)
+        if relative.startswith(os.pardir) or not path.endswith(scanner.SOURCE_EXTENSIONS):
+            return False
+        directory = self.path
+        for part in relative.split(os.sep)[:-1]:
+            directory = os.path.join(directory, part)
+            if part in scanner.SKIP_DIRS or os.path.isfile(os.path.join(directory, "pyvenv.cfg")):
+                return False
+        return True
+
+    def _forget(self, path):
+        prefix = path + os.sep
+        for known in [p for p in self.per_file if p == path or p.startswith(prefix)]:
+            del self.per_file[known]
+            self.errors.pop(known, None)
+
+    def _refresh_files(self, changed):
+        rescan = set()
+        rescanned = 0
+        if changed is None:
+            self.per_file.clear()
+            self.errors.clear()
+            rescan.update(scanner.iter_source_files(self.path) if self.is_dir else [self.path])
+        else:
+            moved = set()
+            for path in map(os.path.abspath, changed):
+                known = path in self.per_file
+                self._forget(path)
+                if os.path.isdir(path):
+                    moved.add(os.path.basename(path))
+                    rescan.update(p for p in scanner.iter_source_files(path) if self._included(p))
+                elif os.path.isfile(path):
+                    if self._included(path):
+                        rescan.add(path)
+                    if not known:
+                        moved.add(_module_name(path))
+                else:
+                    moved.add(_module_name(path))
+            # A module that appeared or vanished changes whether other
+            # files' imports of it are local. Their contents did not change;
+            # the import cache holds their raw imports and classifies them
+            # again on the way out.
+            if moved:
+                labels = moved | {scanner.local_label(name) for name in moved}
+                dependents = {path for path, imports in self.per_file.items() if imports & labels} - rescan
+                self._scan(dependents, self.import_cache)
+                rescanned += len(dependents)
+
+        self._scan(rescan, self.import_cache)
+        rescanned += len(rescan)
+
+        imports = set()
+        for found in self.per_file.values():
+            imports |= found
+        return frozenset(imports), sorted(self.errors.items()), rescanned
+
+    def _scan(self, paths, import_cache):
+        workers = None if len(paths) > 64 else 1
+        results = list(scanner.scan_files(sorted(paths), workers, import_cache, self.fast))
+        for result in results:
+            self.per_file[result.path] = result.imports
+            if result.error:
+                self.errors[result.path] = result.error
+            else:
+                self.errors.pop(result.path, None)
+        return results
+
+
+def watch(project, on_update, stop, debounce=DEBOUNCE_SECONDS, polling=False, log=None):
+    # Calls on_update with a full Update first, then with one per burst of
+    # changes, until stop (a threading.Event) is set.
+    log = log or (lambda text: None)
+    source = open_watcher(project.roots(), polling)
+    try:
+        log(f"Watching {project.path} ({source.kind})\n")
+        # The watcher is opened first so saves made during the initial scan
+        # are not missed.
+        update = project.refresh()
+        on_update(update)
+        while not stop.is_set():
+            changed = source.changes(0.25)
+            if not changed:
+                continue
+            deadline = time.monotonic() + MAX_DELAY_SECONDS
+            while not stop.is_set() and time.monotonic() < deadline:
+                more = source.changes(debounce)
+                if not more:
+                    break
+                changed |= more
+            if stop.is_set():
+                break
+            previous, update = update, project.refresh(changed)
+            # Touched but unchanged files, e.g. a save without edits.
+            if (update.imports, update.errors) != (previous.imports, previous.errors):
+                on_update(update)
+    finally:
+        source.close()
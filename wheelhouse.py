@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+import pipstream
+import scanner
+import venvs
+
+PIP_ENV = {"PIP_DISABLE_PIP_VERSION_CHECK": "1"}
+
+
+def _run_pip(python, args, env=None, **stream):
+    return pipstream.run_pip(python, args, env=dict(PIP_ENV, **(env or {})), **stream)
+
+
+class Wheelhouse:
+    def __init__(self, root=None):
+        self.root = root or cache.cache_dir("wheelhouse")
+        os.makedirs(self.root, exist_ok=True)
+
+    def wheels(self):
+        return sorted(name for name in os.listdir(self.root) if name.endswith(".whl"))
+
+    def install(self, python, requirements_file, **stream):
+        return _run_pip(python, ["install", "--no-index", "--find-links", self.root, "-r", requirements_file],
+                        **stream)
+
+    def collect(self, python, requirements, workers=None, log=None, env=None, cancel=None):
+        # Each top-level requirement is built in its own pip process. pip
+        # writes finished wheels with an atomic rename, so two jobs that
+        # share a dependency at worst build it twice. Setting cancel stops
+        # the running pip processes and skips the builds not yet started.
+        if workers is None:
+            workers = min(4, scanner.available_cores())
+
+        def build(requirement):
+            if cancel is not None and cancel.is_set():
+                return requirement, None
+            result = _run_pip(python, ["wheel", "--wheel-dir", self.root, "--find-links", self.root, requirement],
+                              env=env, cancel=cancel)
+            if result.cancelled:
+                return requirement, None
+            if log:
+                status = "ready" if result.returncode == 0 else "failed"
+                log(f"Wheel for {requirement}: {status}\n")
+            return requirement, result
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(build, requirements))
+        return [(requirement, result.stderr) for requirement, result in results
+                if result is not None and result.returncode != 0]
+
+    def provision(self, python, requirements_file, log=None, **stream):
+        result = self.install(python, requirements_file, **stream)
+        if result.returncode == 0 or result.cancelled:
+            return result
+
+        with open(requirements_file, "r", encoding="utf-8") as f:
+            requirements = venvs.requirement_lines(f.read())
+        if log:
+            log(f"Collecting {len(requirements)} requirements into the wheelhouse...\n")
+        cancel = stream.get("cancel")
+        self.collect(python, requirements, log=log, env=stream.get("env"), cancel=cancel)
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+            return result
+        return self.install(python, requirements_file, **stream)